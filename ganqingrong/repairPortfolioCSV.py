@@ -1,22 +1,34 @@
+import argparse
 import pandas as pd
+from tableio import add_format_argument, read_table, read_table_chunks, write_table
 
-# Load both CSVs
-performance_df = pd.read_csv("performance.csv", parse_dates=["datetime"])
-portfolio_df = pd.read_csv("portfolio.csv")
+parser = argparse.ArgumentParser(description="Fill portfolio annualisedreturn from the latest performance record.")
+add_format_argument(parser)
+parser.add_argument("--chunk-rows", type=int, default=1_000_000,
+                    help="performance rows read at a time (default 1,000,000)")
+args = parser.parse_args()
+
+def latest_rows(df):
+    """The latest row of each portfolioid in df; on equal datetimes the later row wins."""
+    return df.loc[df.iloc[::-1].groupby("portfolioid", sort=False)["datetime"].idxmax()]
+
+# Get the latest annual return for each portfolioid in one pass over performance,
+# keeping only one (datetime, annualreturns) row per portfolio between chunks
+latest = None
+for chunk in read_table_chunks("performance", args.format, ["portfolioid", "datetime", "annualreturns"],
+                               args.chunk_rows, parse_dates=["datetime"]):
+    latest = latest_rows(chunk if latest is None else pd.concat([latest, chunk], ignore_index=True))
 
-# Get the latest annual return for each portfolioid
 latest_returns = (
-    performance_df.sort_values("datetime")
-    .groupby("portfolioid")
-    .last()
-    [["annualreturns"]]
+    latest.set_index("portfolioid")[["annualreturns"]]
     .rename(columns={"annualreturns": "annualisedreturn"})
 )
 
 # Update the portfolio dataframe
+portfolio_df = read_table("portfolio", args.format)
 portfolio_df = portfolio_df.drop(columns=["annualisedreturn"]).merge(
     latest_returns, on="portfolioid", how="left"
 )
 
-# Save to new CSV
-portfolio_df.to_csv("repaired_portfolio.csv", index=False)
+# Save to new table
+write_table(portfolio_df, "repaired_portfolio", args.format)
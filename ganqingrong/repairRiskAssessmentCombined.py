@@ -1,11 +1,16 @@
-import pandas as pd
+import argparse
+from tableio import add_format_argument, read_table, write_table
 
-# Load CSVs
-risk_df = pd.read_csv("riskassessment_combined.csv")
-investor_df = pd.read_csv("investor.csv")
+parser = argparse.ArgumentParser(description="Join investor details onto the combined risk assessments.")
+add_format_argument(parser)
+args = parser.parse_args()
+
+# Load tables
+risk_df = read_table("riskassessment_combined", args.format)
+investor_df = read_table("investor", args.format)
 
 # Merge based on phonenumber (left join to keep all risk assessment entries)
 merged_df = risk_df.merge(investor_df, on="phonenumber", how="left")
 
-# Save to new CSV
-merged_df.to_csv("repaired_riskassessment_combined.csv", index=False)
+# Save to new table
+write_table(merged_df, "repaired_riskassessment_combined", args.format)
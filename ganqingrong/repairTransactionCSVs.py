@@ -1,33 +1,61 @@
-import pandas as pd
-import random
-
-# Load all CSVs
-transaction_df = pd.read_csv("transaction.csv")
-withdrawal_topup_df = pd.read_csv("withdrawalortopuptransaction.csv")
-market_transaction_df = pd.read_csv("markettransaction.csv")
-company_df = pd.read_csv("posttradecompany.csv")
-
-# Step 1: Remove transactionids from market_transaction_df that are in withdrawal_topup_df
-market_transaction_df = market_transaction_df[
-    ~market_transaction_df["transactionid"].isin(withdrawal_topup_df["transactionid"])
-]
-
-# Step 2: Find transactionids that are in transaction.csv but NOT in withdrawalortopuptransaction.csv
-topup_ids = set(withdrawal_topup_df["transactionid"])
-all_ids = set(transaction_df["transactionid"])
-to_add_ids = all_ids - topup_ids
-
-# Randomly assign companyid to new transactionids
-new_entries = []
-available_companies = company_df["companyid"].tolist()
-
-for tid in to_add_ids:
-    random_company = random.choice(available_companies)
-    new_entries.append({"transactionid": tid, "companyid": random_company})
-
-# Add the new entries
-new_entries_df = pd.DataFrame(new_entries)
-market_transaction_df = pd.concat([market_transaction_df, new_entries_df], ignore_index=True)
-
-# Save the updated market transaction file
-market_transaction_df.to_csv("repaired_markettransaction.csv", index=False)
+import argparse
+import numpy as np
+from tableio import TableWriter, add_format_argument, read_table, read_table_chunks
+
+parser = argparse.ArgumentParser(description="Rebuild markettransaction from the non withdrawal/top-up transactions.")
+add_format_argument(parser)
+parser.add_argument("--seed", type=int, default=42, help="seed for the companyids of new market transactions")
+parser.add_argument("--chunk-rows", type=int, default=1_000_000,
+                    help="transaction rows read at a time (default 1,000,000)")
+args = parser.parse_args()
+
+class IdBitmap:
+    """A set of transaction numbers (the NNN of tNNN) as one bit per number, grown as needed."""
+
+    def __init__(self):
+        self.bits = np.zeros(0, dtype=np.uint8)
+
+    def add(self, numbers):
+        if len(numbers) == 0:
+            return
+        size = int(numbers.max()) // 8 + 1
+        if size > len(self.bits):
+            self.bits = np.concatenate([self.bits, np.zeros(max(size, 2 * len(self.bits)) - len(self.bits), np.uint8)])
+        np.bitwise_or.at(self.bits, numbers >> 3, (1 << (numbers & 7)).astype(np.uint8))
+
+    def contains(self, numbers):
+        found = np.zeros(len(numbers), dtype=bool)
+        inside = (numbers >> 3) < len(self.bits)
+        found[inside] = (self.bits[numbers[inside] >> 3] >> (numbers[inside] & 7)) & 1
+        return found
+
+def transaction_numbers(ids):
+    return ids.str.slice(1).astype(np.int64).to_numpy()
+
+def id_chunks(name, column="transactionid"):
+    return read_table_chunks(name, args.format, [column], args.chunk_rows)
+
+rng = np.random.default_rng(args.seed)
+available_companies = read_table("posttradecompany", args.format)["companyid"].to_numpy()
+
+# Step 1: The withdrawal/top-up transactionids, the small side of the join
+topup_ids = IdBitmap()
+for chunk in id_chunks("withdrawalortopuptransaction"):
+    topup_ids.add(transaction_numbers(chunk["transactionid"]))
+
+with TableWriter("repaired_markettransaction", args.format, ["transactionid", "companyid"]) as writer:
+    # Step 2: Keep the market transactions that are not withdrawals/top-ups
+    market_ids = IdBitmap()
+    for chunk in read_table_chunks("markettransaction", args.format, ["transactionid", "companyid"], args.chunk_rows):
+        numbers = transaction_numbers(chunk["transactionid"])
+        keep = ~topup_ids.contains(numbers)
+        market_ids.add(numbers[keep])
+        writer.write(chunk[keep])
+
+    # Step 3: Stream transaction past both sets; every other transaction becomes a
+    # market transaction with a random companyid
+    for chunk in id_chunks("transaction"):
+        numbers = transaction_numbers(chunk["transactionid"])
+        new = chunk[~topup_ids.contains(numbers) & ~market_ids.contains(numbers)].copy()
+        new["companyid"] = rng.choice(available_companies, size=len(new))
+        writer.write(new)
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pandas as pd
+
+# The column lists come from the generator, the sc2207 package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from sc2207.formats import CATEGORY_COLUMNS  # low-cardinality text columns, dictionary-encoded in the binary formats
+
+# Table formats shared by the repair scripts. parquet and arrow (Arrow IPC file)
+# keep real column types, so nothing has to be re-parsed; they need pyarrow.
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+def add_format_argument(parser):
+    parser.add_argument("--format", choices=sorted(EXTENSIONS), default="csv",
+                        help="format of the input and output tables (default csv)")
+
+def read_table(name, fmt, parse_dates=None):
+    """Read <name>.csv / .parquet / .arrow into a DataFrame."""
+    filename = name + EXTENSIONS[fmt]
+    if fmt == "parquet":
+        return pd.read_parquet(filename)
+    if fmt == "arrow":
+        return pd.read_feather(filename)
+    return pd.read_csv(filename, parse_dates=parse_dates)
+
+def read_table_chunks(name, fmt, columns=None, chunk_rows=1_000_000, parse_dates=None):
+    """
+    Read <name>.csv / .parquet / .arrow as a stream of DataFrames of at most chunk_rows
+    rows (Arrow IPC files: one per record batch, as they were written).
+    """
+    filename = name + EXTENSIONS[fmt]
+    if fmt == "csv":
+        yield from pd.read_csv(filename, usecols=columns, parse_dates=parse_dates, chunksize=chunk_rows)
+        return
+    import pyarrow as pa
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(filename).iter_batches(batch_size=chunk_rows, columns=columns)
+    else:
+        reader = pa.ipc.open_file(filename)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        df = batch.to_pandas()
+        yield df if columns is None else df[columns]
+
+def write_table(df, name, fmt):
+    """Write a DataFrame as <name>.csv / .parquet / .arrow."""
+    filename = name + EXTENSIONS[fmt]
+    if fmt == "csv":
+        df.to_csv(filename, index=False)
+        return
+    df = df.astype({c: "category" for c in df.columns if c in CATEGORY_COLUMNS})
+    if fmt == "parquet":
+        df.to_parquet(filename, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(filename)
+
+class TableWriter:
+    """Write DataFrame chunks with the given columns to <name>.csv / .parquet / .arrow, one after another."""
+
+    def __init__(self, name, fmt, columns):
+        self.filename = name + EXTENSIONS[fmt]
+        self.fmt = fmt
+        self.columns = columns
+        self.sink = None
+        if fmt == "csv":
+            self.sink = open(self.filename, "w", newline="")
+            pd.DataFrame(columns=columns).to_csv(self.sink, index=False)
+
+    def write(self, df):
+        if self.fmt == "csv":
+            df[self.columns].to_csv(self.sink, index=False, header=False)
+            return
+        if df.empty:
+            return
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df[self.columns], preserve_index=False)
+        if self.sink is None:
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                self.sink = pq.ParquetWriter(self.filename, table.schema)
+            else:
+                self.sink = pa.ipc.new_file(self.filename, table.schema)
+            self.schema = table.schema
+        self.sink.write_table(table.cast(self.schema))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.sink is None:  # binary format without any rows
+            write_table(pd.DataFrame(columns=self.columns), self.filename[:-len(EXTENSIONS[self.fmt])], self.fmt)
+        else:
+            self.sink.close()
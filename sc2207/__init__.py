@@ -0,0 +1,4 @@
+"""SC2207 test data generator: every table, in every profile, format and layout."""
+from .generatecsv import main, make_config
+from .profiles import PROFILES
+from .tasks import TABLES, build_tasks, run_tables
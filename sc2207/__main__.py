@@ -0,0 +1,3 @@
+from .generatecsv import main
+
+main()
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+
+from .profiles import PROFILES
+from .formats import FORMAT_EXTENSIONS
+from .checkpoints import CHECKPOINT_DIR, SOURCE_DIGEST, TaskCheckpoint, task_keys
+from .tasks import build_tasks, run_task
+from .generatecsv import make_config
+
+# ----------------------------
+# GENERATION BENCHMARK
+# python -m sc2207.benchmark runs every task of generatecsv.py (the tables, the portfolio repair and the
+# performance split) at several scale factors and records, per task, the rows and
+# bytes it wrote, its wall and CPU time, rows/s, bytes/s and its peak RSS. Each
+# scale runs in a fresh process in its own scratch directory, with the tasks run
+# one at a time in TABLES order so their figures do not overlap. Results go to a
+# JSON file; --compare checks them against an earlier one.
+# ----------------------------
+DEFAULT_SCALES = [1, 100, 10000]
+
+def reset_peak_rss():
+    """Reset the process's RSS high-water mark (Linux); returns whether it could."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss():
+    """Peak resident set size in bytes: VmHWM on Linux, else ru_maxrss (never reset)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def rates(rows, nbytes, seconds):
+    seconds = max(seconds, 1e-9)
+    return {"rows_per_sec": rows / seconds, "bytes_per_sec": nbytes / seconds}
+
+def bench_scale(scale, seed, engine, fmt, profile, workdir):
+    """Generate every table at `scale` in `workdir`; returns the per-task measurements."""
+    os.chdir(workdir)
+    random.seed(seed)
+    cfg = make_config(scale, seed, engine, fmt=fmt, profile=profile)
+    tasks = build_tasks(cfg)
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    keys = task_keys(cfg, tasks)
+    results = {}
+    tables = {}
+    for name, (deps, task) in tasks.items():
+        checkpoint = TaskCheckpoint(name, keys[name], resume=False)
+        reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        results[name] = run_task(name, task, cfg, {d: results[d] for d in deps}, checkpoint)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        files = checkpoint.state["files"]
+        rows = sum(progress["rows"] for progress in files.values())
+        nbytes = sum(progress["bytes"] for progress in files.values())
+        tables[name] = {"files": sorted(files), "rows": rows, "bytes": nbytes,
+                        "seconds": wall, "cpu_seconds": cpu, **rates(rows, nbytes, wall),
+                        "peak_rss_bytes": peak_rss()}
+    rows = sum(t["rows"] for t in tables.values())
+    nbytes = sum(t["bytes"] for t in tables.values())
+    seconds = sum(t["seconds"] for t in tables.values())
+    total = {"rows": rows, "bytes": nbytes, "seconds": seconds, **rates(rows, nbytes, seconds),
+             "peak_rss_bytes": max(t["peak_rss_bytes"] for t in tables.values())}
+    return {"scale": scale, "total": total, "tables": tables}
+
+def run_scale(scale, args):
+    workdir = tempfile.mkdtemp(prefix=f"sc2207-bench-{scale:g}-", dir=args.workdir)
+    try:
+        # A fresh process per scale, so one scale's memory does not raise the next one's peak
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            return pool.submit(bench_scale, scale, args.seed, args.engine, args.format, args.profile,
+                               workdir).result()
+    finally:
+        if args.keep:
+            print(f"Kept the scale {scale:g} output in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def print_run(run):
+    print(f"\nScale {run['scale']:g}:")
+    print(f"  {'task':<30} {'rows':>12} {'MB':>9} {'s':>8} {'rows/s':>12} {'MB/s':>8} {'peak MB':>8}")
+    for name, t in list(run["tables"].items()) + [("TOTAL", run["total"])]:
+        print(f"  {name:<30} {t['rows']:>12,} {t['bytes'] / 1e6:>9.1f} {t['seconds']:>8.2f} "
+              f"{t['rows_per_sec']:>12,.0f} {t['bytes_per_sec'] / 1e6:>8.1f} {t['peak_rss_bytes'] / 1e6:>8.0f}")
+
+def compare(report, baseline, tolerance, min_seconds):
+    """
+    Print the tasks that got slower (rows/s) or bigger (peak RSS) than in `baseline`
+    by more than `tolerance`; returns how many. Tasks that took under `min_seconds`
+    in the baseline are too noisy to compare.
+    """
+    for setting in ("profile", "engine", "format", "seed"):
+        if report[setting] != baseline.get(setting, "denzel" if setting == "profile" else None):
+            print(f"Warning: the baseline ran with {setting} {baseline.get(setting)}, this run with {report[setting]}.")
+    before = {run["scale"]: run for run in baseline["runs"]}
+    regressions = 0
+    for run in report["runs"]:
+        if run["scale"] not in before:
+            continue
+        for name, t in run["tables"].items():
+            old = before[run["scale"]]["tables"].get(name)
+            if old is None or not old["rows"] or old["seconds"] < min_seconds:
+                continue
+            speed = t["rows_per_sec"] / max(old["rows_per_sec"], 1e-9)
+            memory = t["peak_rss_bytes"] / max(old["peak_rss_bytes"], 1)
+            if speed < 1 - tolerance or memory > 1 + tolerance:
+                regressions += 1
+                print(f"REGRESSION scale {run['scale']:g} {name}: {speed:.2f}x rows/s, {memory:.2f}x peak RSS")
+    print(f"{regressions} regression(s) against the baseline (tolerance {tolerance:.0%}).")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generatecsv.py per table at several scale factors.")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES,
+                        help="scale factors to run (default 1 100 10000)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (default 42)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="denzel")
+    parser.add_argument("--engine", choices=["numpy", "python"], default=None,
+                        help="default: the profile's engine")
+    parser.add_argument("--format", choices=sorted(FORMAT_EXTENSIONS), default="csv",
+                        help="output format (sqlite has no per-task byte counts and is not supported)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON report (default benchmark.json)")
+    parser.add_argument("--workdir", default=None, help="where the scratch output directories go (default: system temp)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated files")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON report of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown or memory growth that counts as a regression (default 0.2 = 20%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.1,
+                        help="skip tasks that took less than this in the baseline (default 0.1)")
+    args = parser.parse_args()
+    args.engine = args.engine or PROFILES[args.profile]["engine"]
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source_digest": SOURCE_DIGEST,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "profile": args.profile,
+        "engine": args.engine,
+        "format": args.format,
+        "runs": [],
+    }
+    for scale in args.scales:
+        run = run_scale(scale, args)
+        print_run(run)
+        report["runs"].append(run)
+        with open(args.output, "w") as f:  # rewritten after every scale, so a long run leaves partial results
+            json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(report, json.load(f), args.tolerance, args.min_seconds):
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import pickle
+import random
+
+from .generators import date_range, transaction_blocks
+
+# ----------------------------
+# CHECKPOINTS (--resume)
+# Every task keeps checkpoints/<task>.json: a key hashing the generator source, the
+# configuration (seed, scale, engine, partitioning, format) and the keys of its
+# inputs, plus the chunks, rows and bytes written to each of its files so far. A
+# completed task also pickles its result and the `random` state, so a rerun can
+# skip it and hand the same keys to the tables downstream. Changing an input
+# changes the key of every task after it, which are then regenerated.
+# With the numpy engine every table and shard has its own random stream (see
+# table_rng), so --tables can regenerate just some of them: their dependencies
+# come from their checkpoints (or are run too if they have none), and the files
+# come out byte for byte as in a full run.
+# ----------------------------
+CHECKPOINT_DIR = "checkpoints"
+
+# The modules whose source goes into every key: all but the instrumentation, which writes no table
+SOURCE_MODULES = ("profiles", "formats", "generators", "schema", "partitions", "checkpoints", "tasks", "generatecsv")
+
+_digest = hashlib.sha256()
+for _module in SOURCE_MODULES:
+    with open(os.path.join(os.path.dirname(__file__), _module + ".py"), "rb") as _source:
+        _digest.update(_source.read())
+SOURCE_DIGEST = _digest.hexdigest()
+
+DATED_TASKS = ("performance", "transaction", "markettransaction", "rebalancingtransaction",
+               "withdrawalortopuptransaction", "prices")
+
+def task_dates(cfg, name):
+    """
+    The part of the date range a task depends on: PERFORMANCE, the transaction
+    tables (whose ids follow the range) and the prices of --performance valued
+    depend on all of it, except that a month
+    shard only depends on its own month (and, for TRANSACTION, its id block), so a
+    longer --end with --resume adds months without redoing the earlier ones. The
+    other tables do not depend on it.
+    """
+    table, _, shard = name.partition("/")
+    if table not in DATED_TASKS:
+        return None
+    if shard and cfg["partition_by"] == "month":
+        month = str(date_range(cfg)[int(shard)])
+        if table == "performance":
+            return month
+        blocks = transaction_blocks(cfg)
+        return [month, int(blocks["first"][int(shard)]), int(blocks["count"][int(shard)])]
+    return [cfg["start"], cfg["end"]]
+
+def task_keys(cfg, tasks):
+    """Content key of every task. The python engine's tables share one random stream, so each also depends on the one before."""
+    # the range and the transaction count that follows from it come in through task_dates
+    config = {k: v for k, v in cfg.items()
+              if k not in ("resume", "checkpoint", "instrument", "start", "end", "n_per_type")}
+    keys = {}
+    previous = []
+    for name, (deps, _) in tasks.items():
+        inputs = [keys[d] for d in deps] + (previous if cfg["engine"] == "python" else [])
+        keys[name] = hashlib.sha256(json.dumps([SOURCE_DIGEST, name, config, task_dates(cfg, name),
+                                                inputs]).encode()).hexdigest()
+        previous = [keys[name]]
+    return keys
+
+class TaskCheckpoint:
+    """The checkpoint of one task; see CHECKPOINTS above."""
+
+    def __init__(self, name, key, resume):
+        stem = os.path.join(CHECKPOINT_DIR, name.replace("/", "-"))
+        self.name = name
+        self.path = stem + ".json"
+        self.result_path = stem + ".pkl"
+        self.state = {"key": key, "complete": False, "files": {}}
+        if resume and os.path.exists(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            if saved["key"] == key:
+                self.state = saved
+
+    def save(self):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.state, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def is_complete(self):
+        """Whether the task completed with these inputs and its files are still as it left them."""
+        return self.state["complete"] and all(
+            os.path.exists(filename) and os.path.getsize(filename) == progress["bytes"]
+            for filename, progress in self.state["files"].items())
+
+    def track(self, filename):
+        """Start (or restart) a file from scratch."""
+        self.state["complete"] = False
+        self.state["files"][filename] = {"chunks": 0, "rows": 0, "bytes": 0}
+        self.save()
+
+    def resume_point(self, filename):
+        """Progress of an interrupted file whose completed chunks are all still on disk, or None."""
+        progress = self.state["files"].get(filename)
+        if progress and progress["chunks"] and os.path.exists(filename) and os.path.getsize(filename) >= progress["bytes"]:
+            return progress
+        return None
+
+    def chunk_done(self, filename, f, chunks, rows):
+        f.flush()
+        self.state["files"][filename] = {"chunks": chunks, "rows": rows, "bytes": f.tell()}
+        self.save()
+
+    def complete(self, result):
+        for filename, progress in self.state["files"].items():
+            progress["bytes"] = os.path.getsize(filename)
+        with open(self.result_path, "wb") as f:
+            pickle.dump({"result": result, "random_state": random.getstate()}, f)
+        self.state["complete"] = True
+        self.save()
+
+    def load_result(self):
+        with open(self.result_path, "rb") as f:
+            saved = pickle.load(f)
+        random.setstate(saved["random_state"])
+        return saved["result"]
@@ -0,0 +1,362 @@
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import stat
+import sys
+import time
+
+import numpy as np
+
+from .formats import BUFFER_BYTES, CHUNK_ROWS, format_chunk_keys, format_datetimes, str_column, table_columns
+from .generators import mt_header, perf_header, rt_header, trans_header, wot_header
+from .checkpoints import CHECKPOINT_DIR, task_keys
+from .tasks import build_tasks, checkpointed_results, table_rng
+from .generatecsv import config_from_args, config_parser
+
+# ----------------------------
+# INCREMENTAL FEED
+# python -m sc2207.feed continues a generated dataset as a live workload. It takes
+# the portfolios, assets and latest PERFORMANCE datetimes of the run in the current
+# directory from its checkpoints (it never writes the run's tables; the run must
+# have completed with the same options) and then keeps appending TRANSACTION rows
+# with their MARKETTRANSACTION, REBALANCINGTRANSACTION or WITHDRAWALORTOPUPTRANSACTION
+# row, and PERFORMANCE rows, at the target rates, with the distributions of the
+# numpy engine:
+#   transactionid   continues after the last one of the batch and of earlier feed
+#                   sessions, up to the largest id of the dataset's width
+#                   (--transaction-digits); the feed does not start unless they
+#                   last for --duration, or for a day without it
+#   datetimes       the current second (UTC), never later. A portfolio has at most
+#                   one PERFORMANCE row a second, after those of earlier sessions, so
+#                   (portfolioid, datetime) stays unique; a tick draws its rows from
+#                   the portfolios without a row in the current second
+# checkpoints/feed.json keeps the session number (each session draws from a stream
+# of its own), the next transactionid and the last PERFORMANCE second. It is saved
+# as every batch is generated, before the batch is written, so a session that is
+# interrupted leaves at most a gap in the ids.
+# Rows go to rolling CSV files (<output>/<table>/000001.csv, ...; a file is
+# <name>.part until it is complete) or, as "<table>,<values>" CSV lines, to stdout
+# or a Unix socket. A bounded queue sits between the generator and the writer: when
+# the consumer falls behind, the generator waits instead of buffering, and the rows
+# it fell behind by are dropped (and counted in its reports).
+# ----------------------------
+TICK_SECONDS = 0.1
+CATCH_UP_TICKS = 2  # a batch makes up for a late tick, but no more
+REPORT_SECONDS = 10
+UNBOUNDED_SECONDS = 24 * 3600  # the transactionids a feed without --duration needs at the least
+FEED_TABLES = {
+    "transaction": trans_header,
+    "markettransaction": mt_header,
+    "rebalancingtransaction": rt_header,
+    "withdrawalortopuptransaction": wot_header,
+    "performance": perf_header,
+}
+FEED_INPUTS = ["portfolio", "asset", "performance", "transaction"]  # tasks whose checkpointed results it needs
+STATE_PATH = os.path.join(CHECKPOINT_DIR, "feed.json")
+
+def feed_state(cfg):
+    """
+    The state of the next session: the one the last session left, if it ran on this
+    dataset (the checkpoint keys of FEED_INPUTS), or else the end of the batch run.
+    """
+    keys = task_keys(cfg, build_tasks(cfg))
+    dataset = {name: keys[name] for name in FEED_INPUTS}
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f:
+            state = json.load(f)
+        if state["dataset"] == dataset:
+            return dict(state, session=state["session"] + 1)
+    return {"dataset": dataset, "session": 0, "next_transaction": 3 * cfg["n_per_type"] + 1, "last_second": None}
+
+def ids_left(cfg, state):
+    """Transactionids the dataset's width leaves after the state's next one."""
+    return 10 ** cfg["key_widths"]["transactionid"] - state["next_transaction"]
+
+class Feed:
+    """The state of a generated dataset that new rows continue from, and the generator of those rows."""
+
+    def __init__(self, cfg, results, state):
+        self.cfg = cfg
+        self.state = state
+        self.rng = table_rng(cfg, "feed", state["session"])
+        self.invested = np.asarray(results["portfolio"], dtype=np.int64)
+        self.num_assets = len(results["asset"]["portfolio"])
+        self.latest = results["performance"]["latest"].minutes * 60  # last PERFORMANCE second of each portfolio
+        if state["last_second"] is None:  # first session: the batch run's last second
+            state["last_second"] = int(self.latest.max())
+        np.maximum(self.latest, state["last_second"], out=self.latest)  # none before an earlier session's rows
+        self.columns = {name: table_columns(cfg, name, header) for name, header in FEED_TABLES.items()}
+        self.save()
+
+    def save(self):
+        with open(STATE_PATH + ".tmp", "w") as f:
+            json.dump(self.state, f)
+        os.replace(STATE_PATH + ".tmp", STATE_PATH)
+
+    def ids_left(self):
+        return ids_left(self.cfg, self.state)
+
+    def headers(self):
+        return {name: header for name, (header, _) in self.columns.items()}
+
+    def rows(self, name, rows):
+        """Project and format the rows of one table the way write_table does."""
+        header, picks = self.columns[name]
+        if picks:
+            rows = list(map(picks, rows))
+        return format_chunk_keys(self.cfg, header, rows)
+
+    def transactions(self, n, now):
+        """n new transactions at second `now`, each with its subtype row."""
+        rng = self.rng
+        first = self.state["next_transaction"]
+        tnum = np.arange(first, first + n)
+        self.state["next_transaction"] = first + n
+        amounts = rng.integers(500, 10001, size=n)
+        port_idx = rng.integers(0, len(self.invested), size=n)
+        asset_idx = rng.integers(0, self.num_assets, size=n)
+        kind = rng.integers(0, 3, size=n)  # market, rebalancing, withdrawal/topup
+        dates = format_datetimes(np.full(n, now).astype("datetime64[s]"))
+        market, rebalancing, withdrawal = (kind == 0), (kind == 1), (kind == 2)
+        fees = np.round(self.invested[port_idx[rebalancing]] * 0.002, 2)
+        types = np.array(["topup", "withdrawal"])[rng.integers(0, 2, size=int(withdrawal.sum()))]
+        return [
+            ("transaction", self.rows("transaction", list(zip(
+                tnum.tolist(), str_column(amounts), dates, (port_idx + 1).tolist(), (asset_idx + 1).tolist())))),
+            ("markettransaction", self.rows("markettransaction", list(zip(
+                tnum[market].tolist(), rng.integers(1, 16, size=int(market.sum())).tolist())))),
+            ("rebalancingtransaction", self.rows("rebalancingtransaction", list(zip(
+                tnum[rebalancing].tolist(), str_column(fees))))),
+            ("withdrawalortopuptransaction", self.rows("withdrawalortopuptransaction", list(zip(
+                tnum[withdrawal].tolist(), types.tolist())))),
+        ]
+
+    def performance(self, n, now):
+        """
+        New PERFORMANCE rows at second `now` of n random portfolios without a row at
+        `now` yet, or of all of them if there are fewer.
+        """
+        rng = self.rng
+        free = np.flatnonzero(self.latest < now)
+        port_idx = np.sort(rng.choice(free, size=min(n, len(free)), replace=False))
+        n = len(port_idx)
+        self.latest[port_idx] = now
+        if n:
+            self.state["last_second"] = max(self.state["last_second"], now)
+        invested = self.invested[port_idx]
+        gainloss = rng.integers(-2000, 2001, size=n)
+        annualreturns = np.round(-5 + (gainloss + 2000) / 4000.0 * 20, 2)
+        dailychange = np.round(rng.uniform(-5, 5, size=n), 2)
+        return [("performance", self.rows("performance", list(zip(
+            (port_idx + 1).tolist(), format_datetimes(np.full(n, now).astype("datetime64[s]")),
+            str_column(invested), str_column(annualreturns), str_column(dailychange),
+            str_column(gainloss), str_column(invested + gainloss)))))]
+
+    def batch(self, num_transactions, num_performance):
+        """The rows of one batch; the state after it is saved before they are handed out."""
+        now = int(time.time())
+        batch = self.transactions(num_transactions, now) + self.performance(num_performance, now)
+        self.save()
+        return batch
+
+class RollingFiles:
+    """
+    Each table as numbered CSV files under <directory>/<table>/, with the table's
+    header; a file is written as <name>.part and renamed once it has roll_rows rows.
+    """
+
+    def __init__(self, directory, headers, roll_rows):
+        self.directory = directory
+        self.headers = headers
+        self.roll_rows = roll_rows
+        self.files = {}  # table: [file, csv writer, rows, number]
+        for table in headers:
+            os.makedirs(os.path.join(directory, table), exist_ok=True)
+
+    def path(self, table, number):
+        return os.path.join(self.directory, table, f"{number:06d}.csv")
+
+    def open(self, table, number):
+        f = open(self.path(table, number) + ".part", "w", newline="", buffering=BUFFER_BYTES)
+        writer = csv.writer(f, lineterminator="\r\n")
+        writer.writerow(self.headers[table])
+        self.files[table] = [f, writer, 0, number]
+
+    def finish(self, table):
+        f, _, _, number = self.files.pop(table)
+        f.close()
+        os.replace(self.path(table, number) + ".part", self.path(table, number))
+
+    def write(self, batch):
+        for table, rows in batch:
+            while rows:
+                if table not in self.files:
+                    numbers = [int(name[:6]) for name in os.listdir(os.path.join(self.directory, table))]
+                    self.open(table, max(numbers, default=0) + 1)
+                state = self.files[table]
+                take = self.roll_rows - state[2]
+                state[1].writerows(rows[:take])
+                state[2] += len(rows[:take])
+                rows = rows[take:]
+                if state[2] == self.roll_rows:
+                    self.finish(table)
+
+    async def send(self, batch):
+        await asyncio.to_thread(self.write, batch)
+
+    async def close(self):
+        for table in list(self.files):
+            self.finish(table)
+
+def stream_lines(batch):
+    """A batch as "<table>,<values>" CSV lines."""
+    buffer = io.StringIO()
+    lines = csv.writer(buffer, lineterminator="\n")
+    for table, rows in batch:
+        lines.writerows((table, *row) for row in rows)
+    return buffer.getvalue().encode()
+
+class StreamSink:
+    """stream_lines on an asyncio stream; drain() waits while the reader is behind."""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    async def send(self, batch):
+        self.writer.write(stream_lines(batch))
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        with contextlib.suppress(ConnectionError):
+            await self.writer.wait_closed()
+
+class FileSink:
+    """stream_lines written to a regular file, which asyncio cannot watch, with blocking writes in a thread."""
+
+    def __init__(self, f):
+        self.f = f
+
+    async def send(self, batch):
+        await asyncio.to_thread(self.f.write, stream_lines(batch))
+
+    async def close(self):
+        await asyncio.to_thread(self.f.flush)
+
+async def open_sink(args, headers):
+    if args.socket:
+        _, writer = await asyncio.open_unix_connection(args.socket)
+        return StreamSink(writer)
+    if args.output == "-":
+        mode = os.fstat(sys.stdout.fileno()).st_mode
+        if not (stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode)):
+            return FileSink(sys.stdout.buffer)
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.connect_write_pipe(
+            lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader()), sys.stdout.buffer)
+        return StreamSink(asyncio.StreamWriter(transport, protocol, None, loop))
+    return RollingFiles(args.output, headers, args.roll_rows)
+
+def report(rows, dropped, seconds, queue):
+    print(f"{rows:,} rows in {seconds:.0f}s ({rows / max(seconds, 1e-9):,.0f} rows/s), "
+          f"{dropped:,} dropped behind the target rates, queue {queue.qsize()}/{queue.maxsize}", file=sys.stderr)
+
+async def produce(feed, queue, transaction_rate, performance_rate, duration):
+    """
+    Queue a batch of new rows every TICK_SECONDS, as many as are due at the target
+    rates, up to CATCH_UP_TICKS ticks' worth. While the queue is full the producer
+    waits on it; the rows it fell behind by past that are then dropped rather than
+    made up in one burst, and reported, as are the PERFORMANCE rows there were no
+    portfolios free for in the current second. Returns False if it stopped because
+    the transaction ids ran out.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    next_report = start + REPORT_SECONDS
+    done_t = done_p = rows = dropped = 0
+    exhausted = False
+    while duration is None or loop.time() - start < duration:
+        elapsed = loop.time() - start
+        due_t, due_p = int(transaction_rate * elapsed), int(performance_rate * elapsed)
+        n_t = min(due_t - done_t, max(1, round(transaction_rate * TICK_SECONDS * CATCH_UP_TICKS)))
+        n_p = min(due_p - done_p, max(1, round(performance_rate * TICK_SECONDS * CATCH_UP_TICKS)))
+        if n_t > feed.ids_left():
+            exhausted = True
+            print(f"Stopping: the transactionids would need more than {feed.cfg['key_widths']['transactionid']} "
+                  "digits; generate the dataset with a larger --transaction-digits.", file=sys.stderr)
+            break
+        # a transaction is two rows, with its subtype row
+        dropped += 2 * (due_t - done_t - n_t) + (due_p - done_p - n_p)
+        done_t, done_p = due_t, due_p
+        batch = feed.batch(n_t, n_p)
+        dropped += n_p - len(dict(batch)["performance"])
+        rows += sum(len(table_rows) for _, table_rows in batch)
+        await queue.put(batch)
+        if loop.time() >= next_report:
+            report(rows, dropped, loop.time() - start, queue)
+            next_report += REPORT_SECONDS
+        await asyncio.sleep(max(0.0, start + (int(elapsed / TICK_SECONDS) + 1) * TICK_SECONDS - loop.time()))
+    report(rows, dropped, loop.time() - start, queue)
+    await queue.put(None)
+    return not exhausted
+
+async def run_feed(feed, args):
+    """Run the producer and write its batches to the sink; returns the producer's result."""
+    sink = await open_sink(args, feed.headers())
+    queue = asyncio.Queue(maxsize=args.queue)
+    producer = asyncio.create_task(produce(feed, queue, args.transaction_rate, args.performance_rate, args.duration))
+    try:
+        while (batch := await queue.get()) is not None:
+            await sink.send(batch)
+    finally:
+        producer.cancel()
+        await sink.close()
+    return producer.result()
+
+def main():
+    parser = config_parser("denzel", "Keep appending TRANSACTION and PERFORMANCE rows to a generated dataset; "
+                                         "the options that describe the dataset must be those it was generated with.")
+    parser.add_argument("--transaction-rate", type=float, default=1000,
+                        help="TRANSACTION rows per second, each with its subtype row (default 1000)")
+    parser.add_argument("--performance-rate", type=float, default=1000,
+                        help="PERFORMANCE rows per second (default 1000)")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds (default: never)")
+    parser.add_argument("--output", default="feed",
+                        help="directory of the rolling files (default feed), or - for CSV lines on stdout")
+    parser.add_argument("--socket", help="send the CSV lines to this Unix socket instead")
+    parser.add_argument("--roll-rows", type=int, default=CHUNK_ROWS,
+                        help=f"rows per rolling file (default {CHUNK_ROWS})")
+    parser.add_argument("--queue", type=int, default=16,
+                        help="batches generated ahead of a slow consumer before the feed waits (default 16)")
+    args = parser.parse_args()
+    cfg = config_from_args(parser, args)
+    if args.engine != "numpy" or args.format == "sqlite":
+        parser.error("the feed needs --engine numpy and a format other than sqlite")
+    if min(args.transaction_rate, args.performance_rate) < 0 or args.roll_rows < 1 or args.queue < 1:
+        parser.error("the rates must not be negative and --roll-rows and --queue must be positive")
+
+    try:
+        results = checkpointed_results(cfg, FEED_INPUTS)
+    except ValueError as e:
+        parser.error(f"{e} in this directory; generate the dataset first (python -m sc2207 with the same options)")
+    state = feed_state(cfg)
+    needed = math.ceil(args.transaction_rate * (UNBOUNDED_SECONDS if args.duration is None else args.duration))
+    if needed > ids_left(cfg, state):
+        parser.error(f"the dataset's {cfg['key_widths']['transactionid']}-digit transactionids leave "
+                     f"{ids_left(cfg, state):,} for the feed, and {args.transaction_rate:g} a second "
+                     f"{'for a day' if args.duration is None else f'for {args.duration:g}s'} need {needed:,}; "
+                     f"generate it with --transaction-digits {len(str(state['next_transaction'] + needed - 1))} "
+                     "(or more), or feed fewer")
+    feed = Feed(cfg, results, state)
+    try:
+        if not asyncio.run(run_feed(feed, args)):
+            sys.exit(1)
+    except (KeyboardInterrupt, BrokenPipeError, ConnectionError):
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+import csv
+import gc
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from itertools import islice
+from operator import itemgetter
+import numpy as np
+
+# ----------------------------
+# 0. CONFIGURATION
+# ----------------------------
+# Every table is produced as a stream of chunks of at most CHUNK_ROWS rows and
+# written through a BUFFER_BYTES file buffer, so no table is ever held in memory
+# as a whole. Only the keys later tables need are kept, in compact arrays.
+CHUNK_ROWS = 100_000
+BUFFER_BYTES = 1 << 20
+
+def scaled(n, scale):
+    """Scale a base row count (the scale 1 size) by `scale`, keeping at least one row."""
+    return max(1, round(n * scale))
+
+def open_resumable(filename, checkpoint):
+    """
+    Open a text output file for writing. If `checkpoint` has progress for it from an
+    interrupted run, the file is truncated to the end of its last completed chunk and
+    reopened there; returns (file, {"chunks": .., "rows": ..} already written).
+    """
+    progress = checkpoint.resume_point(filename) if checkpoint else None
+    if progress:
+        f = open(filename, 'r+', newline='', buffering=BUFFER_BYTES)
+        f.seek(progress["bytes"])
+        f.truncate()
+        return f, progress
+    if checkpoint:
+        checkpoint.track(filename)
+    return open(filename, 'w', newline='', buffering=BUFFER_BYTES), {"chunks": 0, "rows": 0}
+
+# csv.writer quotes a field holding one of these; a chunk without any is written as
+# plain joins, column by column, instead of by csv.writer row by row
+CSV_SPECIALS = (",", '"', "\r", "\n")
+
+def csv_text(rows, lineterminator, formats=None):
+    """
+    The CSV lines of a chunk of rows, as csv.writer would write them, with the
+    columns in `formats` (index: function of a column) formatted first. Returns
+    (lines, None), or (None, formatted rows) when a field would need quoting and the
+    chunk has to go through csv.writer after all.
+    """
+    columns = list(zip(*rows))
+    for i, format_column in (formats or {}).items():
+        columns[i] = format_column(columns[i])
+    for i, column in enumerate(columns):
+        try:
+            text = "\x1f".join(column)
+        except TypeError:  # ints, floats or None among the strings
+            column = columns[i] = ["" if value is None else str(value) for value in column]
+            text = "\x1f".join(column)
+        if any(special in text for special in CSV_SPECIALS):
+            return None, zip(*columns)
+    if len(columns) == 1 and "" in columns[0]:
+        return None, zip(*columns)  # csv.writer writes a lone empty field as ""
+    return lineterminator.join(map(",".join, zip(*columns))) + lineterminator, None
+
+def write_csv_rows(f, writer, rows, lineterminator, formats=None):
+    if not rows:
+        return
+    text, quoted = csv_text(rows, lineterminator, formats)
+    if text is None:
+        writer.writerows(quoted)
+    else:
+        f.write(text)
+
+def write_csv(filename, header, chunks, checkpoint=None, lineterminator="\r\n", formats=None):
+    """
+    Stream chunks (lists of rows) into a CSV file with the given header, formatting
+    the columns in `formats` on the way (see csv_text); returns the row count. When resuming, the chunks already in the file are still generated (so the random
+    draws and collected keys replay exactly) but not written again.
+    """
+    f, progress = open_resumable(filename, checkpoint)
+    count = progress["rows"]
+    with f:
+        writer = csv.writer(f, lineterminator=lineterminator)
+        if not progress["chunks"]:
+            writer.writerow(header)
+        for i, chunk in enumerate(chunks):
+            if i < progress["chunks"]:
+                continue
+            write_csv_rows(f, writer, chunk, lineterminator, formats)
+            count += len(chunk)
+            if checkpoint:
+                checkpoint.chunk_done(filename, f, i + 1, count)
+    return count
+
+def also_write_csv(chunks, filename, header, transform, checkpoint=None, lineterminator="\r\n"):
+    """Pass chunks through unchanged while writing transform(chunk) to a second CSV file."""
+    f, progress = open_resumable(filename, checkpoint)
+    count = progress["rows"]
+    with f:
+        writer = csv.writer(f, lineterminator=lineterminator)
+        if not progress["chunks"]:
+            writer.writerow(header)
+        for i, chunk in enumerate(chunks):
+            if i >= progress["chunks"]:
+                rows = transform(chunk)
+                write_csv_rows(f, writer, rows, lineterminator)
+                count += len(rows)
+                if checkpoint:
+                    checkpoint.chunk_done(filename, f, i + 1, count)
+            yield chunk
+
+# ----------------------------
+# OUTPUT FORMATS (--format csv|parquet|arrow|sqlite|pgcopy)
+# The binary formats need pyarrow. Columns are written with real types (looked up
+# by column name below) instead of str() text, and low-cardinality text columns
+# are dictionary-encoded, so loaders do not have to re-parse anything.
+# sqlite loads every table straight into one database (--database) and pgcopy
+# writes PostgreSQL COPY FROM STDIN scripts; see DATABASE SCHEMA below.
+# ----------------------------
+FORMAT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow", "pgcopy": ".copy.sql"}
+OUTPUT_FORMATS = sorted(FORMAT_EXTENSIONS) + ["sqlite"]
+
+INT_COLUMNS = {
+    "annualincome", "timeline", "amountofmoney", "investedvalue", "gainloss", "marketvalue",
+    "transactionamount", "cashamount", "numofbonds", "numcommodity", "numofstocks",
+}
+FLOAT_COLUMNS = {
+    "annualisedreturn", "portfoliofee", "annualreturns", "dailychange", "allocationratio", "dividendyield",
+    "expenseratio", "interestrate", "dividendyields", "peratio", "ebdta", "ebita", "eps", "fee",
+}
+TIMESTAMP_COLUMNS = {"datetime", "transactiondate"}
+DATE_COLUMNS = {"dateofbirth", "datecreated", "maturitydate"}
+CATEGORY_COLUMNS = {
+    "gender", "company", "goalname", "risktolerance", "question1", "question2", "question3", "question4",
+    "question5", "stockname", "commoditytype", "currency", "type", "companyname", "region",
+}
+
+def table_filename(cfg, name):
+    if cfg["format"] == "sqlite":
+        return cfg["database"]
+    return name + FORMAT_EXTENSIONS[cfg["format"]]
+
+def sql_table(name):
+    """Database table of an output name; the shards 'performance/shard-000' etc. all load into 'performance'."""
+    return name.replace(os.sep, "/").split("/")[0]
+
+def table_writer(cfg, name, header):
+    """Writer (with write(chunk) and a context manager) for one table in a non-CSV format."""
+    checkpoint = cfg.get("checkpoint")
+    if cfg["format"] == "sqlite":
+        return SqliteTableWriter(cfg["database"], name, header)
+    if cfg["format"] == "pgcopy":
+        return PgCopyWriter(table_filename(cfg, name), name, header, checkpoint)
+    if checkpoint:
+        checkpoint.track(table_filename(cfg, name))  # rewritten from scratch when resuming
+    return ArrowTableWriter(table_filename(cfg, name), header, cfg["format"], checkpoint)
+
+def table_columns(cfg, name, header):
+    """
+    The columns the profile of cfg writes for table `name` out of the generated ones
+    in `header`: (file header, itemgetter picking them from a row, or None for all).
+    """
+    columns = cfg["columns"].get(name, header)
+    renames = cfg["renames"].get(name, {})
+    picks = None if columns == header else itemgetter(*map(header.index, columns))
+    return [renames.get(column, column) for column in columns], picks
+
+def write_table(cfg, name, header, chunks, lineterminator="\r\n"):
+    """Write a table with integer keys in the output format of cfg["format"]; returns the row count."""
+    header, picks = table_columns(cfg, name, header)
+    if picks:
+        chunks = (list(map(picks, chunk)) for chunk in chunks)
+    if cfg["format"] == "csv":
+        # the keys are formatted column-wise while the lines are built
+        return write_csv(table_filename(cfg, name), header, chunks, cfg.get("checkpoint"), lineterminator,
+                         key_formats(cfg, header))
+    chunks = (format_chunk_keys(cfg, header, chunk) for chunk in chunks)
+    return write_rows(cfg, name, header, chunks, lineterminator)
+
+def write_rows(cfg, name, header, chunks, lineterminator="\r\n"):
+    """write_table for rows whose keys are already formatted."""
+    if cfg["format"] == "csv":
+        return write_csv(table_filename(cfg, name), header, chunks, cfg.get("checkpoint"), lineterminator)
+    with table_writer(cfg, name, header) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer.rows
+
+def also_write_table(cfg, chunks, name, header, transform):
+    """also_write_csv for any output format."""
+    return also_write_rows(cfg, chunks, name, header, lambda chunk: format_chunk_keys(cfg, header, transform(chunk)))
+
+def also_write_rows(cfg, chunks, name, header, transform, lineterminator="\r\n"):
+    """also_write_table for rows whose keys are already formatted."""
+    if cfg["format"] == "csv":
+        yield from also_write_csv(chunks, table_filename(cfg, name), header, transform, cfg.get("checkpoint"),
+                                  lineterminator)
+        return
+    with table_writer(cfg, name, header) as writer:
+        for chunk in chunks:
+            writer.write(transform(chunk))
+            yield chunk
+
+def arrow_type(column):
+    import pyarrow as pa
+    if column in INT_COLUMNS:
+        return pa.int64()
+    if column in FLOAT_COLUMNS:
+        return pa.float64()
+    if column in TIMESTAMP_COLUMNS:
+        return pa.timestamp("s")
+    if column in DATE_COLUMNS:
+        return pa.date32()
+    if column in CATEGORY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+class ArrowTableWriter:
+    """
+    Writes row chunks to a Parquet or Arrow IPC file, one record batch (Parquet row
+    group) per chunk. Dictionaries only ever grow, so later batches are deltas of
+    earlier ones as the Arrow IPC file format requires.
+    """
+
+    def __init__(self, filename, header, fmt, checkpoint=None):
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+
+        self.filename = filename
+        self.checkpoint = checkpoint
+        self.header = header
+        self.rows = 0
+        self.schema = pa.schema([pa.field(column, arrow_type(column)) for column in header])
+        self.dictionaries = {column: [] for column in header if column in CATEGORY_COLUMNS}
+        if fmt == "parquet":
+            self.sink = pq.ParquetWriter(filename, self.schema)
+        else:
+            self.sink = pa.ipc.new_file(filename, self.schema,
+                                        options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def to_array(self, column, values):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if column in self.dictionaries:
+            seen = self.dictionaries[column]
+            arr = pa.array(values, pa.string())
+            seen.extend(v for v in pc.unique(arr).to_pylist() if v not in seen)
+            dictionary = pa.array(seen, pa.string())
+            return pa.DictionaryArray.from_arrays(pc.index_in(arr, value_set=dictionary).cast(pa.int32()), dictionary)
+        if column in TIMESTAMP_COLUMNS:
+            return pc.strptime(pa.array(values, pa.string()), format="%Y-%m-%d %H:%M:%S", unit="s")
+        if column in DATE_COLUMNS:
+            return pc.strptime(pa.array(values, pa.string()), format="%Y-%m-%d", unit="s").cast(pa.date32())
+        field_type = self.schema.field(column).type
+        if pa.types.is_string(field_type):
+            return pa.array(values, pa.string())
+        return pa.array(values).cast(field_type)
+
+    def write(self, chunk):
+        import pyarrow as pa
+
+        if not chunk:
+            return
+        self.rows += len(chunk)
+        columns = [self.to_array(column, list(values)) for column, values in zip(self.header, zip(*chunk))]
+        self.sink.write_batch(pa.record_batch(columns, schema=self.schema))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.sink.close()
+        if self.checkpoint:
+            self.checkpoint.state["files"][self.filename]["rows"] = self.rows
+
+def report_load(table, rows, start):
+    seconds = time.perf_counter() - start
+    print(f"Loaded {rows:,} rows into {table} in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/s).")
+
+@lru_cache(maxsize=None)
+def sqlite_connection(database):
+    """
+    The bulk-load connection to `database`, one per process: no fsyncs, in-memory
+    temp tables and a large page cache. Writers of tables produced in the same pass
+    (RISKASSESSMENT1 and the combined table) share it and its transaction.
+    """
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")  # 256 MiB
+    conn.execute("PRAGMA foreign_keys = OFF")  # checked once with foreign_key_check after the load
+    return conn
+
+class SqliteTableWriter:
+    """
+    Inserts row chunks into a table created by create_sqlite_schema, with one
+    executemany per chunk and the whole table in a single transaction. The CSV text
+    values are converted by the column affinities of the DDL.
+    """
+
+    def __init__(self, database, name, header):
+        self.table = sql_table(name)
+        self.conn = sqlite_connection(database)
+        self.sql = f'INSERT INTO "{self.table}" ({", ".join(header)}) VALUES ({", ".join("?" * len(header))})'
+        self.rows = 0
+        self.start = time.perf_counter()
+        self.owns_transaction = not self.conn.in_transaction
+        if self.owns_transaction:
+            self.conn.execute("BEGIN")
+
+    def write(self, chunk):
+        self.conn.executemany(self.sql, chunk)
+        self.rows += len(chunk)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if self.owns_transaction:
+            self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        if exc_type is None:
+            report_load(self.table, self.rows, self.start)
+
+# COPY text format: tab-separated, \N for NULL, backslash escapes for the separators
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def copy_text(value):
+    if value is None or value != value:  # None or NaN
+        return "\\N"
+    return str(value).translate(COPY_ESCAPES)
+
+class PgCopyWriter:
+    """
+    Writes row chunks as a PostgreSQL 'COPY table (columns) FROM STDIN' stream,
+    terminated by '\\.', so `psql -f <name>.copy.sql` loads it after schema.sql.
+    Like write_csv, it continues an interrupted file after its last completed chunk.
+    """
+
+    def __init__(self, filename, name, header, checkpoint=None):
+        self.table = sql_table(name)
+        self.filename = filename
+        self.checkpoint = checkpoint
+        self.f, progress = open_resumable(filename, checkpoint)
+        self.skip = progress["chunks"]
+        self.chunks = progress["chunks"]
+        self.rows = progress["rows"]
+        if not self.skip:
+            self.f.write(f'COPY "{self.table}" ({", ".join(header)}) FROM STDIN;\n')
+        self.start = time.perf_counter()
+
+    def write(self, chunk):
+        if self.skip:
+            self.skip -= 1
+            return
+        self.f.writelines("\t".join(map(copy_text, row)) + "\n" for row in chunk)
+        self.rows += len(chunk)
+        self.chunks += 1
+        if self.checkpoint:
+            self.checkpoint.chunk_done(self.filename, self.f, self.chunks, self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.f.write("\\.\n")
+        self.f.close()
+        if exc_type is None:
+            report_load(self.table, self.rows, self.start)
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector. The rows of a streaming pass are acyclic and
+    freed by reference counting; left on, the collector rescans every live chunk
+    each time a few hundred thousand new rows have been allocated.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def chunked(rows, size=CHUNK_ROWS):
+    """Group a row generator into lists of at most `size` rows."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+# Timestamps are formatted from two tables instead of by strftime per row: a
+# 'YYYY-MM-DD ' string per day and a 'HH:MM:00' string per minute of the day. The
+# python engine works in minutes since the Unix epoch (what datetime64[m] holds).
+TIMES_OF_DAY = np.array([f"{h:02d}:{m:02d}:00" for h in range(24) for m in range(60)], dtype=object)
+TIMES_OF_DAY_LIST = TIMES_OF_DAY.tolist()
+SECONDS = np.array([f"{s:02d}" for s in range(60)], dtype=object)
+
+def format_datetimes(times):
+    """Format an array of datetime64[m] (or datetime64[s]) values as 'YYYY-MM-DD HH:MM:SS' strings."""
+    if len(times) == 0:
+        return []
+    minutes = times.astype("datetime64[m]")
+    first = minutes.min().astype("datetime64[D]")
+    days = np.arange(first, minutes.max().astype("datetime64[D]") + 1)
+    day_strings = np.array([day + " " for day in np.datetime_as_string(days).tolist()], dtype=object)
+    offsets = (minutes - first.astype("datetime64[m]")).astype(np.int64)
+    strings = day_strings[offsets // 1440] + TIMES_OF_DAY[offsets % 1440]
+    seconds = (times - minutes).astype(np.int64)
+    if seconds.any():
+        strings = np.array([text[:-2] for text in strings.tolist()], dtype=object) + SECONDS[seconds]
+    return strings.tolist()
+
+@lru_cache(maxsize=None)
+def day_string(day):
+    return f"{np.datetime64(day, 'D')} "
+
+def format_minute(minute):
+    """Format one timestamp, given in minutes since the epoch, as 'YYYY-MM-DD HH:MM:SS'."""
+    day, time_of_day = divmod(minute, 1440)
+    return day_string(day) + TIMES_OF_DAY_LIST[time_of_day]
+
+@lru_cache(maxsize=None)
+def month_start_minute(year, month):
+    return int(np.datetime64(f"{year}-{month:02d}", "m").astype(np.int64))
+
+def str_column(values):
+    """Stringify a NumPy column the way str() does for the equivalent Python values."""
+    return list(map(str, values.tolist()))
+
+# Columns drawn from a small range are stringified by looking their values up in a
+# table of str() of every value of the range, about 20x faster than str() per value
+@lru_cache(maxsize=None)
+def int_strings(low, high):
+    return np.array([str(i) for i in range(low, high + 1)], dtype=object)
+
+@lru_cache(maxsize=None)
+def cent_strings(limit):
+    return np.array([str(k / 100) for k in range(-limit, limit + 1)] + ["-0.0"], dtype=object)
+
+def str_ints(values, low, high):
+    """str_column of ints in [low, high]."""
+    return int_strings(low, high)[values - low].tolist()
+
+def str_cents(values, limit):
+    """str_column of floats rounded to 2 decimals, at most limit / 100 in magnitude."""
+    index = np.rint(values * 100).astype(np.int64) + limit
+    index[(values == 0) & np.signbit(values)] = 2 * limit + 1  # -0.0
+    return cent_strings(limit)[index].tolist()
+
+# Surrogate keys are 1-based ints everywhere inside the generator; only the writers
+# turn them into ids like 'p001': the prefix plus the number zero-padded to
+# cfg["key_widths"], the digits of the largest possible key of that kind at this
+# scale (at least 3), so ids keep sorting in key order past 999. Transaction ids
+# can be given more digits (--transaction-digits) to leave room for the ids of
+# months added later or of a feed.
+KEY_PREFIXES = {"portfolioid": "p", "goalid": "g", "assetid": "a", "transactionid": "t", "companyid": "brk"}
+
+def key_widths(num_investors, num_assets, n_per_type, transaction_digits=3):
+    max_goals = 3 * num_investors  # 1 to 3 goals (and portfolios) per investor
+    largest = {"portfolioid": max_goals, "goalid": max_goals, "assetid": max(num_assets, max_goals),
+               "transactionid": 3 * n_per_type, "companyid": 15}
+    widths = {column: max(3, len(str(n))) for column, n in largest.items()}
+    widths["transactionid"] = max(widths["transactionid"], transaction_digits)
+    return widths
+
+def format_key(cfg, column, numbers):
+    """Format the key numbers of one column as ids."""
+    return list(map(f"{KEY_PREFIXES[column]}{{:0{cfg['key_widths'][column]}d}}".format, numbers))
+
+def key_formats(cfg, header):
+    """The key columns of `header`, as {index: function formatting a column of their numbers}."""
+    return {i: partial(format_key, cfg, column) for i, column in enumerate(header) if column in KEY_PREFIXES}
+
+def format_chunk_keys(cfg, header, chunk):
+    formats = key_formats(cfg, header)
+    if not formats or not chunk:
+        return chunk
+    columns = list(zip(*chunk))
+    for i, format_column in formats.items():
+        columns[i] = format_column(columns[i])
+    return list(zip(*columns))
+
+# COPY text escapes, undone when a COPY stream is read back
+COPY_UNESCAPES = {"\\\\": "\\", "\\t": "\t", "\\n": "\n", "\\r": "\r"}
+
+def copy_value(text):
+    if text == "\\N":
+        return None
+    if "\\" in text:
+        return re.sub(r"\\.", lambda m: COPY_UNESCAPES.get(m.group(), m.group()[1]), text)
+    return text
+
+def read_chunks(cfg, name, size=CHUNK_ROWS):
+    """
+    Stream a generated table of any output format back as chunks of rows. The text
+    formats give back their values as written, so timestamps stay strings; the
+    binary ones have their timestamps and dates formatted by Arrow, column-wise.
+    """
+    filename = table_filename(cfg, name)
+    fmt = cfg["format"]
+    if fmt == "csv":
+        with open(filename, newline="", buffering=BUFFER_BYTES) as f:
+            rows = csv.reader(f)
+            next(rows)  # header
+            yield from chunked(rows, size)
+    elif fmt == "pgcopy":
+        with open(filename, buffering=BUFFER_BYTES) as f:
+            f.readline()  # COPY ... FROM STDIN;
+            yield from chunked((list(map(copy_value, line.rstrip("\n").split("\t")))
+                                for line in f if line != "\\.\n"), size)
+    elif fmt == "sqlite":
+        cursor = sqlite_connection(filename).execute(f'SELECT * FROM "{sql_table(name)}"')
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                break
+            yield rows
+    else:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        if fmt == "parquet":
+            batches = pq.ParquetFile(filename).iter_batches(batch_size=size)
+        else:
+            reader = pa.ipc.open_file(filename)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        for batch in batches:
+            columns = []
+            for field, column in zip(batch.schema, batch.columns):
+                if pa.types.is_timestamp(field.type):
+                    # Parquet stores timestamp[s] as milliseconds, which %S would print with a fraction
+                    column = pc.strftime(column.cast(pa.timestamp("s")), "%Y-%m-%d %H:%M:%S")
+                elif pa.types.is_date(field.type):
+                    column = pc.strftime(column, "%Y-%m-%d")
+                elif pa.types.is_dictionary(field.type):
+                    column = column.dictionary_decode()
+                columns.append(column.to_pylist())
+            yield list(zip(*columns))
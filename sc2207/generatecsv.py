@@ -0,0 +1,170 @@
+import argparse
+import os
+import random
+import numpy as np
+
+from .profiles import PROFILES
+from .formats import OUTPUT_FORMATS, key_widths, scaled
+from .generators import DEFAULT_MONTHS, PHONE_SPACE, date_range
+from .schema import create_sqlite_schema, index_sqlite, write_pg_scripts
+from .instrument import instrument_options, report_stages, reset_stages
+from .tasks import build_tasks, run_tables, write_manifest
+
+# ----------------------------
+# MAIN
+# ----------------------------
+def make_config(scale, seed=42, engine=None, partition_by="none", shards=8, fmt="csv",
+                database="sc2207.db", resume=False, instrument=(), profile="denzel", performance="monthly",
+                steps_per_day=1, start=DEFAULT_MONTHS[0], end=DEFAULT_MONTHS[1],
+                transaction_digits=3):
+    """
+    The configuration every task receives, for the table sizes of `scale` and the
+    schema variants of `profile` (see profiles.py). `engine` defaults to the profile's.
+    """
+    variants = {k: v for k, v in PROFILES[profile].items() if k != "engine"}
+    months = len(date_range({"start": start, "end": end}))
+    n_per_type = max(1, months * scaled(300, scale) // 12)
+    return {
+        "seed": seed,
+        "profile": profile,
+        **variants,
+        "engine": engine or PROFILES[profile]["engine"],
+        "num_investors": scaled(50, scale),
+        "num_risk_assessments": scaled(50, scale),
+        "num_assets": scaled(150, scale),
+        "n_per_type_per_year": scaled(300, scale),  # market, rebalancing and withdrawal/topup each, per 12 months
+        "n_per_type": n_per_type,  # over the whole range
+        "key_widths": key_widths(scaled(50, scale), scaled(150, scale), n_per_type, transaction_digits),
+        "partition_by": partition_by,
+        "shards": shards,
+        "format": fmt,
+        "database": database,
+        "resume": resume,
+        "instrument": list(instrument),
+        "performance": performance,
+        "steps_per_day": steps_per_day,
+        "start": start,
+        "end": end,
+    }
+
+def config_parser(profile, description):
+    """The options that decide what is generated; main and the feed (feed.py) add their own."""
+    # Scale factor (TPC-style): every table grows in proportion to it while all
+    # foreign keys stay valid. Scale 1 reproduces the original 50 investors,
+    # 150 assets and 900 transactions exactly.
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=profile,
+                        help=f"schema variant and default engine of the files (default {profile}); "
+                             "with --engine python each profile reproduces its original seed 42 files exactly")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="scale factor (default 1 = 50 investors, 150 assets, 900 transactions)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (default 42)")
+    parser.add_argument("--engine", choices=["numpy", "python"], default=None,
+                        help="'numpy' builds PERFORMANCE and TRANSACTION column-wise; "
+                             "'python' is the original per-row loop (default: the profile's engine)")
+    parser.add_argument("--performance", choices=["monthly", "walk", "valued"], default="monthly",
+                        help="'monthly' draws an independent record per portfolio for each month from --start to "
+                             "--end; 'walk' simulates each portfolio's market value as a geometric random walk; "
+                             "'valued' prices its holdings in the asset tables on simulated stock, commodity, fund "
+                             "and bond prices; both run from the start of --start to the end of --end (walk and "
+                             "valued need the numpy engine)")
+    parser.add_argument("--steps-per-day", type=int, default=1,
+                        help="walk or valued points per day, a divisor of 1440 (default 1 = daily)")
+    parser.add_argument("--start", default=DEFAULT_MONTHS[0], metavar="YYYY-MM",
+                        help="first month of the PERFORMANCE records (monthly, walk or valued) and the guaranteed "
+                             f"top-ups (default {DEFAULT_MONTHS[0]}); the transaction window moves with it")
+    parser.add_argument("--end", default=DEFAULT_MONTHS[1], metavar="YYYY-MM",
+                        help=f"last month of the range (default {DEFAULT_MONTHS[1]}); there are 900 transactions "
+                             "(at scale 1) per 12 months of the range, in a window of 365 days per 12 months. With "
+                             "--partition-by month each month is its own shard holding the transactions dated in "
+                             "it, and a later --end with --resume only generates the new months")
+    parser.add_argument("--transaction-digits", type=int, default=3,
+                        help="zero-pad transactionids to at least this many digits (default 3, or the digits of "
+                             "the largest id), so the ids of months added later or of a feed keep sorting in order; "
+                             "a feed (sc2207.feed) needs room for its ids, e.g. 8 digits for a day at 1,000 a second")
+    parser.add_argument("--partition-by", choices=["none", "hash", "month"], default="none",
+                        help="write PERFORMANCE and TRANSACTION as shard files by portfolioid hash or by month, "
+                             "with a manifest.json (numpy engine only)")
+    parser.add_argument("--shards", type=int, default=8, help="number of hash shards (default 8)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                        help="output format; parquet and arrow (IPC file) write typed columns and need pyarrow; "
+                             "sqlite loads everything into --database; pgcopy writes PostgreSQL COPY scripts "
+                             "and a load.sql for psql")
+    parser.add_argument("--database", default="sc2207.db", help="SQLite database for --format sqlite")
+    return parser
+
+def config_from_args(parser, args, resume=False, instrument=()):
+    """Check the options of config_parser, seed `random` and return the configuration they describe."""
+    args.engine = args.engine or PROFILES[args.profile]["engine"]
+    if args.partition_by != "none" and args.engine != "numpy":
+        parser.error("--partition-by needs --engine numpy")
+    if args.performance != "monthly":
+        if args.engine != "numpy":
+            parser.error(f"--performance {args.performance} needs --engine numpy")
+        if args.partition_by == "month":
+            parser.error(f"--performance {args.performance} does not support --partition-by month")
+        if args.steps_per_day < 1 or 1440 % args.steps_per_day:
+            parser.error("--steps-per-day must be a divisor of 1440")
+    try:
+        start, end = np.datetime64(args.start, "M"), np.datetime64(args.end, "M")
+    except ValueError:
+        parser.error("--start and --end must be months like 2024-01")
+    if not np.datetime64("1970-01") <= start <= end:
+        parser.error("--start must be 1970-01 or later and not after --end")
+    if not 3 <= args.transaction_digits <= 18:
+        parser.error("--transaction-digits must be from 3 to 18")
+    if scaled(50, args.scale) > PHONE_SPACE:
+        parser.error(f"--scale {args.scale} needs more investors than there are phone numbers ({PHONE_SPACE})")
+
+    random.seed(args.seed)
+    return make_config(args.scale, args.seed, args.engine, args.partition_by, args.shards,
+                       args.format, args.database, resume, instrument, args.profile, args.performance,
+                       args.steps_per_day, str(start), str(end), args.transaction_digits)
+
+def main(profile="denzel"):
+    parser = config_parser(profile, "Generate the SC2207 CSV files.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes for independent tables (numpy engine only; output does not depend on it)")
+    parser.add_argument("--resume", action="store_true",
+                        help="reuse the checkpoints of an earlier run in this directory: skip tables whose inputs "
+                             "are unchanged and continue interrupted ones after their last completed chunk")
+    parser.add_argument("--tables", nargs="+", metavar="TASK",
+                        help="regenerate only these tables or shards (e.g. performance/003), with the same bytes as "
+                             "a full run; their inputs come from the checkpoints of an earlier run or are generated "
+                             "too (numpy engine only)")
+    parser.add_argument("--instrument", default=os.environ.get("SC2207_INSTRUMENT", ""),
+                        help="comma-separated per-stage instrumentation written to instrumentation/: "
+                             "stats (time, CPU, RNG calls, rows), memory (tracemalloc), cprofile or pyinstrument "
+                             "(profile dumps); defaults to $SC2207_INSTRUMENT")
+    args = parser.parse_args()
+    try:
+        instrument = instrument_options(args.instrument)
+    except ValueError as e:
+        parser.error(str(e))
+    cfg = config_from_args(parser, args, args.resume, instrument)
+    if args.tables and (args.engine != "numpy" or args.format == "sqlite"):
+        parser.error("--tables needs --engine numpy and a format other than sqlite")
+    if args.resume and args.format == "sqlite":
+        parser.error("--resume does not support --format sqlite")
+    unknown = set(args.tables or ()) - set(build_tasks(cfg))
+    if unknown:
+        parser.error(f"--tables: no task {', '.join(sorted(unknown))}; choose from {', '.join(build_tasks(cfg))}")
+    if instrument:
+        reset_stages(build_tasks(cfg))
+    if args.partition_by != "none":
+        os.makedirs("performance", exist_ok=True)
+        os.makedirs("transaction", exist_ok=True)
+    if args.format == "sqlite":
+        create_sqlite_schema(cfg)
+    results = run_tables(cfg, args.workers, args.tables)
+    # a run of some --tables leaves the manifest and load scripts of the full run as they are
+    if args.partition_by != "none" and not args.tables:
+        write_manifest(cfg, results)
+    if args.format == "sqlite":
+        index_sqlite(cfg)
+    elif args.format == "pgcopy" and not args.tables:
+        write_pg_scripts(cfg, results)
+    if instrument:
+        report_stages(build_tasks(cfg))
+
+    print("All operations completed.")
@@ -0,0 +1,1120 @@
+import random
+from array import array
+from datetime import datetime
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+
+from .formats import (
+    CHUNK_ROWS, SECONDS, also_write_rows, format_datetimes, format_minute, gc_paused, month_start_minute,
+    read_chunks, str_cents, str_column, str_ints, write_rows
+)
+
+# ----------------------------
+# HELPER DATA
+# ----------------------------
+first_names = [
+    "john", "jane", "michael", "sarah", "david", "laura", "robert", "linda", "james", "barbara",
+    "william", "elizabeth", "richard", "jennifer", "charles", "maria", "thomas", "susan",
+    "christopher", "margaret", "mark", "nancy", "daniel", "patricia", "kevin", "helen"
+]
+last_names = [
+    "smith", "doe", "johnson", "williams", "brown", "jones", "miller", "davis", "garcia", "rodriguez",
+    "wilson", "martinez", "anderson", "taylor", "hernandez", "moore", "martin", "jackson",
+    "thompson", "white", "hall", "lee", "scott", "green", "young", "clark"
+]
+
+goal_names = [
+    "retirement", "buy a house", "college fund", "vacation", "emergency fund",
+    "car purchase", "investment portfolio", "business startup", "wedding", "health fund"
+]
+
+stock_names = ["apple", "google", "amazon", "microsoft", "tesla"]
+
+brokerage_names = [
+    "charles schwab", "fidelity investments", "td ameritrade", "e*trade", "robinhood",
+    "vanguard", "morgan stanley wealth management", "jpmorgan chase", "bofa securities",
+    "citigroup global markets", "goldman sachs", "ubs", "credit suisse", "deutsche bank", "barclays"
+]
+
+regions = ["america", "europe", "asia", "africa", "oceania"]
+
+commodity_types = ["gold", "silver", "oil", "wheat", "corn"]
+
+options = ["a", "b", "c", "d", "e"]
+
+# Base date used for generating date/times
+base_dt = datetime(2023, 6, 1, 10, 0, 0)
+BASE_MINUTE = int(np.datetime64(base_dt, "m").astype(np.int64))
+# Transactions fall within 365 days (in minutes) of base_dt
+TRANSACTION_WINDOW = 365 * 1440
+# Months of the monthly PERFORMANCE records and the guaranteed top-ups (--start, --end)
+DEFAULT_MONTHS = ("2024-01", "2024-12")
+
+def date_range(cfg):
+    """The months from --start to --end, as datetime64[M]."""
+    return np.arange(np.datetime64(cfg["start"], "M"), np.datetime64(cfg["end"], "M") + 1)
+
+def transaction_window(cfg):
+    """
+    Start (datetime64[m]) and length in minutes of the window transactions fall in:
+    365 days from base_dt for the 12 months of 2024, moved along with --start and
+    stretched in proportion to the number of months in the range.
+    """
+    months = date_range(cfg)
+    base = np.datetime64(base_dt, "m")
+    month = base.astype("datetime64[M]") + (months[0] - np.datetime64(DEFAULT_MONTHS[0], "M"))
+    start = month.astype("datetime64[m]") + (base - base.astype("datetime64[M]"))
+    return start, TRANSACTION_WINDOW * len(months) // 12
+
+def track_range(ranges, column, values):
+    """Widen ranges[column] to cover `values` (ints or datetime64)."""
+    if len(values) == 0:
+        return
+    lo, hi = values.min(), values.max()
+    if column in ranges:
+        lo, hi = min(lo, ranges[column][0]), max(hi, ranges[column][1])
+    ranges[column] = [lo, hi]
+
+# ----------------------------
+# 1. INVESTOR – 3NF (50 rows at scale 1)
+# The phone numbers are kept as 64-bit ints for RISKASSESSMENT1 and FINANCIALGOAL.
+# ----------------------------
+investor_header = ["phonenumber", "name", "dateofbirth", "gender", "email", "annualincome", "company", "otherinformation"]
+
+# Phone numbers are 8 or 9 followed by 7 digits from 10**6, i.e. 2 x 9M of them.
+# The numpy engine hands them out through a keyed Feistel permutation of that
+# space instead of drawing and rejecting repeats: investor i gets the image of
+# i, so numbers are unique by construction, with no membership set and no
+# slowdown as the space fills up.
+PHONE_SPACE = 2 * 9 * 10**6
+PHONE_HALF_BITS = 13  # the network permutes 26-bit values; 2**26 >= PHONE_SPACE
+PHONE_ROUNDS = 6
+
+def phone_keys(rng):
+    """Round keys of the phone permutation, drawn from the investor table's stream."""
+    return rng.integers(0, 2**63, size=PHONE_ROUNDS, dtype=np.uint64)
+
+def feistel(x, keys):
+    mask = np.uint64((1 << PHONE_HALF_BITS) - 1)
+    half = np.uint64(PHONE_HALF_BITS)
+    left, right = x >> half, x & mask
+    for k in keys:
+        f = ((right ^ k) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(37)
+        left, right = right, left ^ (f & mask)
+    return (left << half) | right
+
+def allocate_phones(start, stop, keys):
+    """Phone numbers of investors start..stop-1 (0-based) as an int64 array."""
+    x = feistel(np.arange(start, stop, dtype=np.uint64), keys)
+    # Cycle-walk: values past the phone space are permuted again until they land
+    # inside it, which keeps the map a bijection on [0, PHONE_SPACE)
+    out = x >= PHONE_SPACE
+    while out.any():
+        x[out] = feistel(x[out], keys)
+        out = x >= PHONE_SPACE
+    x = x.astype(np.int64)
+    return (8 + x // 9_000_000) * 10**7 + 10**6 + x % 9_000_000
+
+def allocated_phones(num_investors, keys, size=CHUNK_ROWS):
+    """Stream allocate_phones over all investors, one chunk at a time."""
+    for start in range(0, num_investors, size):
+        yield from allocate_phones(start, min(start + size, num_investors), keys).tolist()
+
+genders = ["m", "f"]
+investor_companies = ["stark industries", "wayne enterprises", "acme corp", "globex corporation", "initech"]
+
+def investor_arrays():
+    """
+    The compact columns kept per investor: its phone number, and for the repaired
+    risk assessments (section XII) the draws its other columns are spelled from.
+    """
+    return {"phone": array("q"), "first": array("B"), "last": array("B"), "dob": array("i"),
+            "gender": array("B"), "income": array("i"), "company": array("B")}
+
+def generate_investors(num_investors, investors_out, phones=None, birth_years=(1960, 2005)):
+    """
+    Investor rows; their columns go to the investor_arrays() `investors_out`. `phones`
+    supplies the phone numbers (numpy engine); without it they are drawn and rejected
+    on repeats as the original script did.
+    """
+    existing_phones = set()
+    for i in range(1, num_investors + 1):
+        if phones is not None:
+            phone = str(next(phones))
+        else:
+            # Generate unique 8-digit phone number starting with 8 or 9
+            while True:
+                phone = random.choice(["8", "9"]) + str(random.randint(10**6, 10**7 - 1))
+                if phone not in existing_phones:
+                    existing_phones.add(phone)
+                    break
+        first = random.choice(first_names)
+        last = random.choice(last_names)
+        name = f"{first} {last}"
+        year = random.randint(*birth_years)
+        month = random.randint(1, 12)
+        day = random.randint(1, 28)
+        dob = f"{year}-{month:02d}-{day:02d}"
+        gender = random.choice(genders)
+        email = f"{first}.{last}{i}@example.com"
+        income = random.randint(30000, 200000)
+        company = random.choice(investor_companies)
+        info = f"client {i}"
+        for column, value in (("phone", int(phone)), ("first", first_names.index(first)),
+                              ("last", last_names.index(last)), ("dob", datetime(year, month, day).toordinal()),
+                              ("gender", genders.index(gender)), ("income", income),
+                              ("company", investor_companies.index(company))):
+            investors_out[column].append(value)
+        yield [phone, name, dob, gender, email, str(income), company, info]
+
+# ----------------------------
+# 2. RISKASSESSMENT1 – 3NF (50 rows at scale 1)
+# Stores only raw responses (no risk tolerance).
+# ----------------------------
+ra1_header = ["phonenumber", "datetime", "question1", "question2", "question3", "question4", "question5"]
+
+# Assessment i is on day i % 365 after base_dt, (i // 365) % 1440 minutes past its time
+# of day; once those 525,600 slots are used, (i // 525,600) % 60 seconds past that and,
+# every 31,536,000 assessments, a year later. The offset is a mixed-radix spelling of i,
+# so no two assessments share a datetime and (phonenumber, datetime) stays unique.
+ASSESSMENT_MINUTES = 365 * 1440
+
+def assessment_seconds(i):
+    """Offset of assessment i (an int or an int array) from base_dt, in seconds."""
+    day = i % 365 + 365 * (i // (ASSESSMENT_MINUTES * 60))
+    return day * 86400 + (i // 365) % 1440 * 60 + (i // ASSESSMENT_MINUTES) % 60
+
+def assessment_arrays():
+    """Per assessment, the investor index and the answer combo code (see ANSWER_DIGITS) of the row."""
+    return {"investor": array("i"), "code": array("h")}
+
+def generate_risk_assessments(num_assessments, investor_phones, assessments_out):
+    # random.choice over a range draws exactly like random.choice over the phone list did
+    investor_idx = range(len(investor_phones))
+    for i in range(num_assessments):
+        k = random.choice(investor_idx)
+        minute, second = divmod(assessment_seconds(i), 60)
+        dt = format_minute(BASE_MINUTE + minute)
+        if second:
+            dt = dt[:-2] + SECONDS[second]
+        answers = [random.choice(options) for _ in range(5)]
+        assessments_out["investor"].append(k)
+        assessments_out["code"].append(sum(options.index(a) * 5 ** (4 - q) for q, a in enumerate(answers)))
+        yield [str(investor_phones[k]), dt] + answers
+
+def generate_risk_assessments_numpy(num_assessments, investor_phones, rng, seen, assessments_out):
+    """
+    Vectorized RISKASSESSMENT_COMBINED chunks (RISKASSESSMENT1 rows plus their
+    risktolerance): each answer combo is drawn as one code in [0, 5^5), and its
+    answers and risktolerance are looked up, not worked out row by row. The codes
+    drawn are marked in `seen` for RISKASSESSMENT2.
+    """
+    phones = np.asarray(investor_phones, dtype=np.int64)
+    base = np.datetime64(base_dt, "s")
+    for start in range(0, num_assessments, CHUNK_ROWS):
+        i = np.arange(start, min(start + CHUNK_ROWS, num_assessments))
+        investor_idx = rng.integers(0, len(phones), size=len(i))
+        phone = phones[investor_idx]
+        dates = base + assessment_seconds(i)
+        codes = rng.integers(0, len(RISK_LOOKUP), size=len(i))
+        seen[codes] = True
+        assessments_out["investor"].frombytes(investor_idx.astype(np.int32).tobytes())
+        assessments_out["code"].frombytes(codes.astype(np.int16).tobytes())
+        yield list(zip(str_column(phone), format_datetimes(dates),
+                       *(letters[codes].tolist() for letters in ANSWER_LETTERS),
+                       RISK_TOLERANCES[RISK_LOOKUP[codes]].tolist()))
+
+# ----------------------------
+# 3. RISKASSESSMENT2 (Rubric) – 3NF
+# Compute "conservative", "moderate", or "aggressive" from the combos in RA1.
+# ----------------------------
+ra2_header = ["question1", "question2", "question3", "question4", "question5", "risktolerance"]
+
+def risk_tolerance(answers):
+    count_non_a = sum(1 for ans in answers if ans != "a")
+    if count_non_a % 3 == 0:
+        return "conservative"
+    elif count_non_a % 3 == 1:
+        return "moderate"
+    else:
+        return "aggressive"
+
+# The rubric for all 5^5 answer combos, indexed by the combo's code: its answers
+# as base-5 digits, question1 first (so code order is answer order)
+ANSWER_DIGITS = (np.arange(len(options) ** 5)[:, None] // len(options) ** np.arange(4, -1, -1)) % len(options)
+ANSWER_LETTERS = np.array(options)[ANSWER_DIGITS.T]  # [question][code]
+RISK_TOLERANCES = np.array(["conservative", "moderate", "aggressive"])
+RISK_LOOKUP = (ANSWER_DIGITS != 0).sum(axis=1) % 3  # index into RISK_TOLERANCES, as risk_tolerance() does
+
+def risk_rubric(seen):
+    """RISKASSESSMENT2 rows for the codes marked in `seen`, in code order."""
+    codes = np.flatnonzero(seen)
+    return list(zip(*(letters[codes].tolist() for letters in ANSWER_LETTERS),
+                    RISK_TOLERANCES[RISK_LOOKUP[codes]].tolist()))
+
+def collect_risk_combos(chunks, unique_risk):
+    """Record each distinct answer combo (at most 5^5) in `unique_risk` as RA1 streams past."""
+    for chunk in chunks:
+        for row in chunk:
+            key = tuple(row[2:7])  # 5 answers
+            if key not in unique_risk:
+                unique_risk[key] = risk_tolerance(key)
+        yield chunk
+
+# ----------------------------
+# 4. FINANCIALGOAL – 3NF
+# Each investor gets between 1 and 3 goals with a timeline and a datecreated.
+# ----------------------------
+# Added new column 'datecreated'
+fg_header = ["goalid", "goalname", "timeline", "amountofmoney", "phonenumber", "datecreated"]
+
+def generate_goals(investor_phones):
+    goal_counter = 1
+    weights = [40, 30, 20, 5, 5, 5, 5, 5, 5, 5]
+    # For simplicity, we'll set datecreated to the base date (or you can generate a random date if desired)
+    datecreated = base_dt.strftime("%Y-%m-%d")
+    for phone in investor_phones:
+        num_goals = random.randint(1, 3)
+        for j in range(num_goals):
+            goalid = goal_counter
+            goal_counter += 1
+            goalname = random.choices(goal_names, weights=weights, k=1)[0]
+            timeline = str(random.randint(2024, 2030))
+            amount = random.randint(30000, 1000000)
+            yield [goalid, goalname, timeline, str(amount), str(phone), datecreated]
+
+# ----------------------------
+# 5. PORTFOLIO – 3NF
+# Each financial goal has one portfolio (1:1), so portfolio pNNN belongs to goal gNNN.
+# 'investedvalue' is also kept (as a 32-bit int per portfolio) to compute performance
+# and rebalancing fees; the denzel profile leaves it out of the file.
+# 'annualisedreturn' is a placeholder that will be corrected after performance generation.
+# ----------------------------
+port_header = ["portfolioid", "annualisedreturn", "investedvalue", "portfoliofee", "goalid"]
+
+def portfolio_fee(investedvalue):
+    return round(investedvalue * 0.0088, 2)
+
+def generate_portfolios(num_goals, invested_out):
+    for k in range(1, num_goals + 1):
+        investedvalue = random.randint(50000, 450000)  # used for performance calculations
+        annualisedreturn = 0  # placeholder
+        portfoliofee = portfolio_fee(investedvalue)
+        invested_out.append(investedvalue)
+        yield [k, str(annualisedreturn), str(investedvalue), str(portfoliofee), k]  # portfolio k belongs to goal k
+
+# ----------------------------
+# 6. PERFORMANCE – single CSV
+# For each portfolio, generate one record a month from --start to --end (the 12
+# months of 2024 by default) with columns:
+#   portfolioid, datetime, investedvalue, annualreturns, dailychange, gainloss, marketvalue
+# We'll then fix 'annualisedreturn' in portfolio.csv using the last record,
+# which LatestReturns keeps track of while the rows stream out.
+# ----------------------------
+perf_header = ["portfolioid", "datetime", "investedvalue", "annualreturns", "dailychange", "gainloss", "marketvalue"]
+
+def random_minute_in_month(year, month):
+    """A random time in the first 28 days of a month, in minutes since the epoch."""
+    day = random.randint(1, 28)
+    hour = random.randint(0, 23)
+    minute = random.randint(0, 59)
+    return month_start_minute(year, month) + ((day - 1) * 24 + hour) * 60 + minute
+
+class LatestReturns:
+    """
+    Running argmax-by-datetime of annualreturns per portfolio: the datetime (as
+    minutes) and annualreturns of the latest PERFORMANCE row seen for each portfolio,
+    of all of them or only of `portfolios` (sorted 0-based indices, a hash shard's).
+    """
+
+    def __init__(self, num_portfolios, portfolios=None):
+        self.portfolios = portfolios
+        size = num_portfolios if portfolios is None else len(portfolios)
+        self.minutes = np.full(size, np.iinfo(np.int64).min)
+        self.returns = np.full(size, np.nan)
+
+    def update(self, portfolios, dates, returns):
+        """Fold in rows given as 0-based portfolio indices, datetime64[m] values and annualreturns."""
+        if self.portfolios is not None:
+            portfolios = np.searchsorted(self.portfolios, portfolios)
+        minutes = dates.astype("datetime64[m]").astype(np.int64)
+        np.maximum.at(self.minutes, portfolios, minutes)
+        latest = minutes == self.minutes[portfolios]
+        self.returns[portfolios[latest]] = returns[latest]
+
+    def merge(self, other):
+        """Fold the LatestReturns of a shard into these of every portfolio."""
+        target = np.arange(len(other.minutes)) if other.portfolios is None else other.portfolios
+        newer = other.minutes > self.minutes[target]
+        self.minutes[target[newer]] = other.minutes[newer]
+        self.returns[target[newer]] = other.returns[newer]
+
+def generate_performance(invested_values, latest, months):
+    """Rows of every portfolio for `months`, a list of (year, month)."""
+    for k, invested in enumerate(invested_values, start=1):
+        dates, returns = [], []
+        for year, month in months:
+            dt_minute = random_minute_in_month(year, month)
+            dt_str = format_minute(dt_minute)
+            gainloss = random.randint(-2000, 2000)
+            fraction = (gainloss + 2000) / 4000.0  # Maps gainloss range to 0..1
+            annualreturns = round(-5 + (fraction * 20), 2)  # Annual returns from -5% to +15%
+            dailychange = round(random.uniform(-5, 5), 2)
+            marketvalue = invested + gainloss
+            dates.append(dt_minute)
+            returns.append(annualreturns)
+            yield [
+                k, dt_str, str(invested),
+                str(annualreturns), str(dailychange),
+                str(gainloss), str(marketvalue)
+            ]
+        latest.update(np.full(len(months), k - 1), np.array(dates).astype("datetime64[m]"), np.array(returns))
+
+def generate_performance_numpy(invested_values, rng, latest, months, portfolios=None, ranges=None):
+    """
+    Vectorized PERFORMANCE chunks: the same distributions as generate_performance,
+    but every column is drawn for a block of portfolios x months (datetime64[M]) at
+    once. `portfolios` (0-based indices, default all) and `months` restrict it to
+    one shard; `ranges` collects the shard's key ranges for the manifest.
+    """
+    invested_all = np.asarray(invested_values, dtype=np.int64)
+    if portfolios is None:
+        portfolios = np.arange(len(invested_all))
+    month_starts = np.asarray(months, dtype="datetime64[M]").astype("datetime64[m]")
+    per = len(months)
+    block = max(1, CHUNK_ROWS // per)
+    for start in range(0, len(portfolios), block):
+        pidx = portfolios[start:start + block]
+        invested = invested_all[pidx]
+        n = len(pidx)
+
+        # Random day/hour/minute within each month, as minute offsets from the month start
+        offsets = (rng.integers(0, 28, size=(n, per)) * 1440
+                   + rng.integers(0, 24, size=(n, per)) * 60
+                   + rng.integers(0, 60, size=(n, per)))
+        dates = (month_starts + offsets).ravel()
+        gainloss = rng.integers(-2000, 2001, size=(n, per))
+        annualreturns = np.round(-5 + (gainloss + 2000) / 4000.0 * 20, 2)  # -5% to +15%
+        dailychange = np.round(rng.uniform(-5, 5, size=(n, per)), 2)
+        marketvalue = invested[:, None] + gainloss
+
+        latest.update(np.repeat(pidx, per), dates, annualreturns.ravel())
+        if ranges is not None:
+            track_range(ranges, "portfolioid", pidx + 1)
+            track_range(ranges, "datetime", dates)
+        yield list(zip(
+            np.repeat(pidx + 1, per).tolist(),
+            format_datetimes(dates), np.repeat(np.array(str_column(invested), dtype=object), per).tolist(),
+            str_cents(annualreturns.ravel(), 1500), str_cents(dailychange.ravel(), 1500),
+            str_ints(gainloss.ravel(), -2000, 2000), str_column(marketvalue.ravel()),
+        ))
+
+# ----------------------------
+# 6b. PERFORMANCE AS A RANDOM WALK (--performance walk, numpy engine)
+# Instead of 12 independent monthly records, each portfolio's market value follows
+# a geometric random walk from its investedvalue at the start of --start, with a
+# point every 1440 / steps_per_day minutes to the end of --end. Every portfolio has its
+# own drift (-5% to +15% a year, the range of the monthly annualreturns) and
+# volatility, and the other columns are derived from the walk:
+#   marketvalue   investedvalue times the cumulative product of the step returns
+#   gainloss      marketvalue - investedvalue
+#   dailychange   % change of marketvalue over the last day (steps_per_day points)
+#   annualreturns % return since the walk started, annualised once that is over a year
+# ----------------------------
+WALK_DAYS_PER_YEAR = 365
+
+def walk_range(cfg):
+    """The first minute of the walk (the start of --start) and its number of days (to the end of --end)."""
+    months = date_range(cfg)
+    start = months[0].astype("datetime64[D]")
+    return start.astype("datetime64[m]"), int(((months[-1] + 1).astype("datetime64[D]") - start).astype(np.int64))
+
+def generate_performance_walk(invested_values, rng, latest, start, days, steps_per_day=1, portfolios=None,
+                              ranges=None):
+    """
+    Random-walk PERFORMANCE chunks, portfolio by portfolio in time order. Blocks of
+    portfolios are walked at once; a walk of more than CHUNK_ROWS points is walked
+    CHUNK_ROWS points at a time, carrying its last day of values over.
+    """
+    invested_all = np.asarray(invested_values, dtype=np.int64)
+    if portfolios is None:
+        portfolios = np.arange(len(invested_all))
+    steps = days * steps_per_day
+    dt = 1 / (WALK_DAYS_PER_YEAR * steps_per_day)  # years per step
+    block = max(1, CHUNK_ROWS // steps)
+    width = min(steps, CHUNK_ROWS)
+    for b in range(0, len(portfolios), block):
+        pidx = portfolios[b:b + block]
+        invested = invested_all[pidx]
+        n = len(pidx)
+        drift = rng.uniform(-0.05, 0.15, size=(n, 1))
+        volatility = rng.uniform(0.05, 0.25, size=(n, 1))
+        # Multiple of investedvalue at the last steps_per_day points (1 before the walk starts)
+        history = np.ones((n, steps_per_day))
+        for first in range(0, steps, width):
+            m = min(width, steps - first)
+            j = np.arange(first + 1, first + m + 1)  # point numbers
+            log_steps = (drift - volatility ** 2 / 2) * dt + volatility * np.sqrt(dt) * rng.standard_normal((n, m))
+            growth = history[:, -1:] * np.cumprod(np.exp(log_steps), axis=1)
+            window = np.concatenate([history, growth], axis=1)
+            history = window[:, -steps_per_day:]
+            yield walk_chunk(pidx, invested, growth, window[:, :m], start, j, steps_per_day, latest,
+                             first + m == steps, ranges)
+
+def walk_chunk(pidx, invested, growth, day_before, start, j, steps_per_day, latest, last, ranges):
+    """
+    PERFORMANCE rows of the portfolios `pidx` at points `j`, from their marketvalue
+    as a multiple of investedvalue at those points (`growth`) and a day before;
+    point 0 is the walk's `start`.
+    """
+    dt = 1 / (WALK_DAYS_PER_YEAR * steps_per_day)
+    marketvalue = np.rint(invested[:, None] * growth).astype(np.int64)
+    gainloss = marketvalue - invested[:, None]
+    dailychange = np.round((growth / day_before - 1) * 100, 2) + 0.0  # + 0.0 turns -0.0 into 0.0
+    annualreturns = np.round((growth ** (1 / np.maximum(j * dt, 1.0)) - 1) * 100, 2) + 0.0
+    dates = start + j * (1440 // steps_per_day)
+    if last:
+        latest.update(pidx, np.full(len(pidx), dates[-1]), annualreturns[:, -1])
+    if ranges is not None:
+        track_range(ranges, "portfolioid", pidx + 1)
+        track_range(ranges, "datetime", dates)
+    return list(zip(
+        np.repeat(pidx + 1, len(j)).tolist(),
+        format_datetimes(dates) * len(pidx),  # the same timestamps for every portfolio of the block
+        str_column(np.repeat(invested, len(j))),
+        str_column(annualreturns.ravel()), str_column(dailychange.ravel()),
+        str_column(gainloss.ravel()), str_column(marketvalue.ravel()),
+    ))
+
+# ----------------------------
+# 6c. PERFORMANCE FROM ASSET PRICES (--performance valued, numpy engine)
+# Price paths are simulated once, on the time grid of 6b, for every instrument the
+# asset tables hold: each stockname, each commoditytype, one fund index and the
+# market yield. All of them load on one market factor, so portfolios holding the
+# same things move together. Each fund follows the index plus its dividendyield
+# less its expenseratio, and each bondname earns its interestrate and moves against
+# the yield by its years to maturity. A portfolio's marketvalue is its holdings
+# times the prices relative to the walk's start: every asset, whatever its subclass,
+# starts out worth its allocationratio share of the portfolio's investedvalue, so
+# the prices only move it. Its PERFORMANCE investedvalue is therefore the
+# portfolio's own; the other columns follow from marketvalue as in 6b. The unit
+# columns of the subclass tables (cashamount, numofbonds, numcommodity and
+# numofstocks) hold that start value over the start price, to the nearest unit:
+# 1 for cash, BOND_FACE for a bond, COMMODITY_PRICES for a commodity and
+# peratio * eps for a stock. Without --performance valued they are random.
+# ----------------------------
+MARKET_DRIFT, MARKET_VOLATILITY = 0.06, 0.15  # a year
+RISK_FREE_RATE = 0.02
+COMMODITY_PRICES = {"gold": 1900.0, "silver": 23.0, "oil": 80.0, "wheat": 6.0, "corn": 5.0}  # a unit, at the start
+BOND_FACE = 1000.0
+# Price rows: the stocks, the commodities, the fund index, cash (always 1), then
+# one row per fund and per bond, priced off the fund index or the yield as needed
+FUND_ROW = len(stock_names) + len(commodity_types)
+CASH_ROW = FUND_ROW + 1
+
+def simulate_prices(rng, days, steps_per_day):
+    """
+    The price rows relative to the walk's start (its points plus the start, where
+    they are all 1) and the change of the market yield since the start.
+    """
+    steps = days * steps_per_day
+    dt = 1 / (WALK_DAYS_PER_YEAR * steps_per_day)
+    beta = np.concatenate([rng.uniform(0.8, 1.4, len(stock_names)), rng.uniform(-0.2, 0.4, len(commodity_types)),
+                           [1.0]])
+    idiosyncratic = np.array([0.25] * FUND_ROW + [0.03])
+    drift = RISK_FREE_RATE + beta * (MARKET_DRIFT - RISK_FREE_RATE)
+    variance = (beta * MARKET_VOLATILITY) ** 2 + idiosyncratic ** 2
+    market = rng.standard_normal(steps)
+    shocks = ((beta * MARKET_VOLATILITY)[:, None] * market
+              + idiosyncratic[:, None] * rng.standard_normal((len(beta), steps)))
+    relative = np.ones((CASH_ROW + 1, steps + 1))
+    relative[:CASH_ROW, 1:] = np.cumprod(np.exp((drift - variance / 2)[:, None] * dt + np.sqrt(dt) * shocks), axis=1)
+    # the yield moves 1 point a year and falls a little when the market rises
+    yield_shocks = -0.3 * market + np.sqrt(1 - 0.3 ** 2) * rng.standard_normal(steps)
+    yield_change = np.concatenate([[0.0], np.cumsum(0.01 * np.sqrt(dt) * yield_shocks)])
+    return {"relative": relative, "yield_change": yield_change}
+
+def asset_start_values(deps, subclass=None):
+    """The allocationratio share of its portfolio's investedvalue of every asset, or of one subclass's."""
+    owners = np.asarray(deps["asset"]["portfolio"], dtype=np.int64)
+    values = np.asarray(deps["asset"]["allocationratio"]) * np.asarray(deps["portfolio"], dtype=np.float64)[owners]
+    if subclass is None:
+        return values
+    start, end = asset_subclass_bounds(deps["asset"])[subclass]
+    return values[start:end].tolist()
+
+def asset_holdings(deps, walk_start):
+    """
+    Per asset, from the results of the asset tasks: its portfolio, its price row
+    and its value at `walk_start` (its allocationratio share of the portfolio's
+    investedvalue). Rows after CASH_ROW (funds, then bonds) are priced as their
+    base row times exp(carry * t - duration * yield change).
+    """
+    owners = np.asarray(deps["asset"]["portfolio"], dtype=np.int64)
+    bounds = asset_subclass_bounds(deps["asset"])
+    rows = np.empty(len(owners), dtype=np.int64)
+    values = asset_start_values(deps)
+
+    start, end = bounds["funds"]
+    rows[start:end] = CASH_ROW + 1 + np.arange(end - start)
+    start, end = bounds["cash"]
+    rows[start:end] = CASH_ROW
+    start, end = bounds["bonds"]
+    rows[start:end] = CASH_ROW + 1 + len(deps["funds"]) + np.arange(end - start)
+    start, end = bounds["commodity"]
+    rows[start:end] = len(stock_names) + np.asarray(deps["commodity"], dtype=np.int64)
+    start, end = bounds["stocks"]
+    rows[start:end] = np.asarray(deps["stocks"], dtype=np.int64)
+
+    num_funds, num_bonds = len(deps["funds"]), len(deps["bonds2"]["interestrate"])
+    maturities = np.asarray(deps["bonds2"]["maturity"], dtype=np.int64) - walk_start.astype(datetime).toordinal()
+    return {"portfolio": owners, "row": rows, "value": values,
+            "base": np.repeat([FUND_ROW, CASH_ROW], [num_funds, num_bonds]),
+            "carry": np.concatenate([deps["funds"], np.asarray(deps["bonds2"]["interestrate"]) / 100]),
+            "duration": np.concatenate([np.zeros(num_funds), np.maximum(maturities, 0) / WALK_DAYS_PER_YEAR])}
+
+def generate_performance_valued(holdings, prices, latest, start, days, steps_per_day=1, portfolios=None,
+                                ranges=None):
+    """
+    Valued PERFORMANCE chunks, portfolio by portfolio in time order. For each block
+    of portfolios, H (portfolios x the price rows they hold, in start values)
+    times those rows' prices is their marketvalue; fund and bond rows are priced on the fly.
+    """
+    owners = holdings["portfolio"]
+    num_portfolios = int(owners[-1]) + 1
+    first_asset = np.searchsorted(owners, np.arange(num_portfolios + 1))  # assets are in portfolio order
+    if portfolios is None:
+        portfolios = np.arange(num_portfolios)
+    steps = days * steps_per_day
+    dt = 1 / (WALK_DAYS_PER_YEAR * steps_per_day)
+    block = max(1, CHUNK_ROWS // steps)
+    width = min(steps, CHUNK_ROWS)
+    for b in range(0, len(portfolios), block):
+        pidx = portfolios[b:b + block]
+        n = len(pidx)
+        counts = first_asset[pidx + 1] - first_asset[pidx]
+        assets = np.repeat(first_asset[pidx] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        used, column = np.unique(holdings["row"][assets], return_inverse=True)
+        H = np.zeros((n, len(used)))
+        np.add.at(H, (np.repeat(np.arange(n), counts), column), holdings["value"][assets])
+        invested = H.sum(axis=1)
+        shared, own = used[used <= CASH_ROW], used[used > CASH_ROW] - CASH_ROW - 1
+        base = holdings["base"][own, None]
+        carry, duration = holdings["carry"][own, None], holdings["duration"][own, None]
+        for first in range(0, steps, width):
+            m = min(width, steps - first)
+            j = np.arange(first + 1, first + m + 1)  # point numbers
+            points = np.maximum(np.arange(first + 1 - steps_per_day, first + m + 1), 0)  # from a day before j
+            P = np.concatenate([prices["relative"][shared[:, None], points],
+                                prices["relative"][base, points]
+                                * np.exp(carry * points * dt - duration * prices["yield_change"][points])])
+            value = (H @ P) / invested[:, None]
+            yield walk_chunk(pidx, np.rint(invested).astype(np.int64), value[:, steps_per_day:], value[:, :m], start,
+                             j, steps_per_day, latest, first + m == steps, ranges)
+
+# ----------------------------
+# 7. ASSET – 3NF
+# Each portfolio gets 1 or 2 assets, summing to a total allocation ratio of 1.0.
+# ----------------------------
+asset_header = ["assetid", "allocationratio", "portfolioid"]
+
+def generate_assets(num_portfolios, total_asset_rows_needed, owners_out, allocations_out):
+    # number of portfolios to get 2 assets (capped so every asset still has a portfolio)
+    m = min(total_asset_rows_needed - num_portfolios, num_portfolios)
+    portfolios_with_two = set(random.sample(range(num_portfolios), m)) if m > 0 else set()
+
+    asset_counter = 1
+    for i in range(num_portfolios):
+        portfolioid = i + 1
+        if i in portfolios_with_two:
+            r1 = random.random()
+            r2 = 1 - r1
+            allocations = [round(r1, 4), round(r2, 4)]
+        else:
+            allocations = [1.0]
+        for allocationratio in allocations:
+            owners_out.append(i)
+            allocations_out.append(allocationratio)
+            yield [asset_counter, allocationratio, portfolioid]
+            asset_counter += 1
+
+def asset_ids_between(start, end):
+    """Asset keys for the 0-based asset positions [start, end)."""
+    return range(start + 1, end + 1)
+
+def asset_subclass_bounds(asset):
+    """Subclass tables take fixed fractions of the asset ids (40/20/20/20/50 of 150 at scale 1)."""
+    num_assets = len(asset["portfolio"])
+    return {
+        "funds": (0, num_assets * 40 // 150),
+        "cash": (num_assets * 40 // 150, num_assets * 60 // 150),
+        "bonds": (num_assets * 60 // 150, num_assets * 80 // 150),
+        "commodity": (num_assets * 80 // 150, num_assets * 100 // 150),
+        "stocks": (num_assets * 100 // 150, num_assets),
+    }
+
+# ----------------------------
+# 8. FUNDS – 3NF (subclass of asset: first 40 asset IDs at scale 1)
+# ----------------------------
+funds_header = ["assetid", "dividendyield", "expenseratio"]
+
+def generate_funds(start, end, carry_out):
+    for aid in asset_ids_between(start, end):
+        dividendyield = round(random.uniform(0.02, 0.06), 3)
+        expenseratio = round(random.uniform(0.01, 0.03), 3)
+        carry_out.append(dividendyield - expenseratio)
+        yield [aid, str(dividendyield), str(expenseratio)]
+
+# ----------------------------
+# 9. CASH – 3NF (subclass of asset: next 20 asset IDs at scale 1)
+# ----------------------------
+cash_header = ["assetid", "cashamount", "currency"]
+
+def generate_cash(start, end, values=None):
+    """Cash rows; with the start `values` of the assets (--performance valued) cashamount is their value."""
+    for k, aid in enumerate(asset_ids_between(start, end)):
+        cashamount = random.randint(1000, 20000)  # drawn either way, so the stream stays the same
+        if values is not None:
+            cashamount = round(values[k])
+        currency = "usd"
+        yield [aid, str(cashamount), currency]
+
+# ----------------------------
+# 10. BONDS1 – 3NF (subclass of asset)
+# ----------------------------
+bonds1_header = ["assetid", "bondname", "numofbonds"]
+
+def generate_bonds1(start, end, values=None):
+    """Bond rows; with the start `values` of the assets, numofbonds is their value in bonds of BOND_FACE."""
+    for i, aid in enumerate(asset_ids_between(start, end), start=1):
+        bondname = f"bond{i}"
+        numofbonds = random.randint(10, 200)
+        if values is not None:
+            numofbonds = round(values[i - 1] / BOND_FACE)
+        yield [aid, bondname, str(numofbonds)]
+
+# ----------------------------
+# 11. BONDS2 – 3NF (Bond details by name)
+# One row per BONDS1 row; bond names are bond1..bondN in BONDS1 order.
+# ----------------------------
+bonds2_header = ["bondname", "interestrate", "dividendyields", "maturitydate"]
+
+def generate_bonds2(num_bonds, rates_out, maturities_out):
+    """Bond rows; the interestrate and maturity (as a date ordinal) of each bond go to the two arrays."""
+    for i in range(1, num_bonds + 1):
+        bondname = f"bond{i}"
+        interestrate = round(random.uniform(1.0, 6.0), 2)
+        dividendyields = round(random.uniform(0.01, 0.06), 3)
+        maturitydate = f"20{random.randint(28,35)}-12-{random.randint(1,28):02d}"
+        rates_out.append(interestrate)
+        maturities_out.append(datetime.fromisoformat(maturitydate).toordinal())
+        yield [bondname, str(interestrate), str(dividendyields), maturitydate]
+
+# ----------------------------
+# 12. COMMODITY – 3NF (subclass of asset)
+# ----------------------------
+commodity_header = ["assetid", "numcommodity", "commoditytype"]
+
+def generate_commodities(start, end, types_out, values=None):
+    """Commodity rows; with the start `values` of the assets, numcommodity is their value in COMMODITY_PRICES."""
+    for k, aid in enumerate(asset_ids_between(start, end)):
+        numcommodity = random.randint(1, 100)
+        commoditytype = random.choice(commodity_types)
+        if values is not None:
+            numcommodity = round(values[k] / COMMODITY_PRICES[commoditytype])
+        types_out.append(commodity_types.index(commoditytype))
+        yield [aid, str(numcommodity), commoditytype]
+
+# ----------------------------
+# 13. STOCKS – 3NF (subclass of asset: last 50 asset IDs at scale 1)
+# ----------------------------
+stocks_header = ["assetid", "peratio", "stockname", "ebdta", "numofstocks", "eps"]
+
+def generate_stocks(start, end, names_out, stock_specs, values=None):
+    """
+    Stock rows; the stockname index of each goes to `names_out`, each name's specs
+    to `stock_specs`. With the start `values` of the assets, numofstocks is their
+    value in shares priced at peratio * eps.
+    """
+    for k, aid in enumerate(asset_ids_between(start, end)):
+        stockname = random.choice(stock_names)
+        if stockname not in stock_specs:
+            peratio = round(random.uniform(10.0, 35.0), 2)
+            ebita = round(random.uniform(1.0, 15.0), 2)
+            eps = round(random.uniform(0.5, 5.0), 2)
+            stock_specs[stockname] = (peratio, ebita, eps)
+        else:
+            peratio, ebita, eps = stock_specs[stockname]
+        numofstocks = random.randint(50, 1000)
+        if values is not None:
+            numofstocks = round(values[k] / (peratio * eps))
+        names_out.append(stock_names.index(stockname))
+        yield [aid, str(peratio), stockname, str(ebita), str(numofstocks), str(eps)]
+
+# ----------------------------
+# 14. TRANSACTION – 900 total at scale 1 (N = 300 of each type per 12 months of the range)
+# (Market, Rebalancing, Withdrawal/Topup)
+# Ids t1..tN are market, tN+1..t2N rebalancing and t2N+1..t3N withdrawal/topup,
+# the first of those the guaranteed top-ups. With --partition-by month the ids
+# are laid out the same way month by month instead (see transaction_blocks).
+# The portfolio of each rebalancing transaction is kept (as a 32-bit portfolio
+# index) for the rebalancing fees.
+# ----------------------------
+trans_header = ["transactionid", "transactionamount", "transactiondate", "portfolioid", "assetid"]
+
+def transaction_blocks(cfg):
+    """
+    The transaction id layout as blocks of consecutive ids: block b holds count[b]
+    market ids from first[b], then count[b] rebalancing and count[b] withdrawal/topup
+    ids, the first topups[b] of which are the guaranteed top-ups of the months of
+    the range from month[b] on. One block holds all of them, except with
+    --partition-by month: then every month of the range has a block of its own,
+    whose size does not depend on the rest of the range, so a later --end only
+    adds blocks.
+    """
+    n = cfg["n_per_type"]
+    if cfg["partition_by"] != "month":
+        return {"first": np.array([1]), "count": np.array([n]), "topups": np.array([min(len(date_range(cfg)), n)]),
+                "month": np.array([0])}
+    months = len(date_range(cfg))
+    # n_per_type_per_year spread evenly over every 12 months, plus the rest on a range too short for one of each
+    counts = np.diff(np.arange(months + 1) * cfg["n_per_type_per_year"] // 12)
+    counts[-1] += n - counts.sum()
+    first = 1 + 3 * np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return {"first": first, "count": counts, "topups": (counts > 0).astype(np.int64), "month": np.arange(months)}
+
+def transaction_ids(blocks, kind):
+    """The ids of one kind (0 market, 1 rebalancing, 2 withdrawal/topup), as a range per block."""
+    return [range(first + kind * count, first + (kind + 1) * count)
+            for first, count in zip(blocks["first"].tolist(), blocks["count"].tolist())]
+
+def transaction_kinds(blocks, tnums):
+    """Block, position in the block and kind (0 market, 1 rebalancing, 2 withdrawal/topup) of transaction numbers."""
+    b = np.searchsorted(blocks["first"], tnums, side="right") - 1  # empty blocks share the next block's first id
+    offset = tnums - blocks["first"][b]
+    return b, offset, offset // blocks["count"][b]
+
+def guaranteed_topups(cfg):
+    """Number of guaranteed top-ups: one per month of the range, at most n_per_type."""
+    return int(transaction_blocks(cfg)["topups"].sum())
+
+def generate_transactions(n_per_type, num_portfolios, num_assets, rebalancing_portfolios_out, window, months,
+                          topup_portfolio="first"):
+    """
+    `window` is the (first minute, length in minutes) of the transaction dates and
+    `months` the (year, month) list of the guaranteed top-ups.
+    """
+    # random.choice over a range draws exactly like random.choice over the id list did
+    portfolio_idx = range(num_portfolios)
+    asset_idx = range(num_assets)
+    first_minute, last_day = window[0], window[1] // 1440 - 1
+
+    # Market and rebalancing transactions
+    for i in range(1, 2 * n_per_type + 1):
+        transactionamount = random.randint(500, 10000)
+        transactiondate = format_minute(first_minute + random.randint(0, last_day) * 1440
+                                        + random.randint(0, 23) * 60 + random.randint(0, 59))
+        p = random.choice(portfolio_idx)
+        assetid = random.choice(asset_idx) + 1
+        if i > n_per_type:
+            rebalancing_portfolios_out[i - n_per_type - 1] = p
+        yield [i, str(transactionamount), transactiondate, p + 1, assetid]
+
+    # Guaranteed top-ups on the 1st day of each month: all to one fixed portfolio (the
+    # first one) with topup_portfolio "first", else each to a random portfolio
+    fixed_portfolioid = 1
+    guaranteed = months[:n_per_type]
+    for t_id, (year, month) in enumerate(guaranteed, start=2 * n_per_type + 1):
+        transactionamount = random.randint(500, 10000)
+        # Set transactiondate to the first day of the month with random time
+        transactiondate = format_minute(month_start_minute(year, month) + random.randint(0, 23) * 60
+                                        + random.randint(0, 59))
+        # Use the fixed portfolio to ensure one investor dollar cost averages every month
+        if topup_portfolio == "first":
+            portfolioid = fixed_portfolioid
+        else:
+            portfolioid = random.choice(portfolio_idx) + 1
+        assetid = random.choice(asset_idx) + 1
+        yield [t_id, str(transactionamount), transactiondate, portfolioid, assetid]
+
+    # Remaining withdrawal transactions randomly
+    for i in range(2 * n_per_type + len(guaranteed) + 1, 3 * n_per_type + 1):
+        transactionamount = random.randint(500, 10000)
+        transactiondate = format_minute(first_minute + random.randint(0, last_day) * 1440
+                                        + random.randint(0, 23) * 60 + random.randint(0, 59))
+        portfolioid = random.choice(portfolio_idx) + 1
+        assetid = random.choice(asset_idx) + 1
+        yield [i, str(transactionamount), transactiondate, portfolioid, assetid]
+
+def generate_transactions_numpy(blocks, num_portfolios, num_assets, rebalancing_out, rng, base, window, months,
+                                tnums=None, portfolios=None, ranges=None, topup_portfolio="first"):
+    """
+    Vectorized TRANSACTION chunks with the id layout of `blocks` (transaction_blocks).
+    The guaranteed top-ups are those of `months` (datetime64[M]), of the first
+    portfolio with topup_portfolio "first". Dates fall in `window`, minute offsets
+    from `base`.
+    `tnums` (transaction numbers), `portfolios` (pool of 0-based portfolio indices)
+    and `window` restrict it to one shard.
+    (transaction numbers, portfolio indices) of rebalancing rows go to `rebalancing_out`.
+    """
+    if tnums is None:
+        tnums = np.arange(1, 3 * int(blocks["count"].sum()) + 1)
+    month_starts = np.asarray(months, dtype="datetime64[M]").astype("datetime64[m]")
+    for start in range(0, len(tnums), CHUNK_ROWS):
+        tnum = tnums[start:start + CHUNK_ROWS]
+        n = len(tnum)
+        amounts = rng.integers(500, 10001, size=n)
+        # base + up to the window's last day, 23 hours and 59 minutes (or the shard's month of that window)
+        dates = base + rng.integers(window[0], max(window[1], window[0] + 1), size=n)
+        if portfolios is None:
+            port_idx = rng.integers(0, num_portfolios, size=n)
+        else:
+            port_idx = portfolios[rng.integers(0, len(portfolios), size=n)]
+        asset_idx = rng.integers(0, num_assets, size=n)
+
+        # Guaranteed top-ups: the first day of each month with a random time
+        b, offset, kind = transaction_kinds(blocks, tnum)
+        topup = offset - 2 * blocks["count"][b]  # 0, 1, ... on the withdrawal/topup rows of a block
+        g = (kind == 2) & (topup < blocks["topups"][b])
+        if g.any():
+            k = int(g.sum())
+            month = blocks["month"][b[g]] + topup[g]
+            dates[g] = month_starts[month] + rng.integers(0, 24, size=k) * 60 + rng.integers(0, 60, size=k)
+            if topup_portfolio == "first":
+                port_idx[g] = 0  # fixed portfolio p001
+
+        r = kind == 1
+        rebalancing_out.append((tnum[r], port_idx[r].astype(np.int32)))
+
+        if ranges is not None:
+            track_range(ranges, "transactionid", tnum)
+            track_range(ranges, "portfolioid", port_idx + 1)
+            track_range(ranges, "transactiondate", dates)
+        yield list(zip(
+            tnum.tolist(), str_ints(amounts, 500, 10000), format_datetimes(dates),
+            (port_idx + 1).tolist(), (asset_idx + 1).tolist(),
+        ))
+
+# ----------------------------
+# MARKETTRANSACTION (t001 – t300 at scale 1)
+# ----------------------------
+mt_header = ["transactionid", "companyid"]
+
+def generate_market_transactions(blocks, companies_out):
+    for i in chain.from_iterable(transaction_ids(blocks, 0)):
+        companyid = random.randint(1, 15)
+        companies_out.append(companyid)
+        yield [i, companyid]
+
+# ----------------------------
+# REBALANCINGTRANSACTION (t301 – t600 at scale 1)
+# ----------------------------
+rt_header = ["transactionid", "fee"]
+
+def generate_rebalancing_transactions(blocks, rebalancing_portfolios, invested_values):
+    for i, p in zip(chain.from_iterable(transaction_ids(blocks, 1)), rebalancing_portfolios.tolist()):
+        fee = round(float(invested_values[p]) * 0.002, 2)
+        yield [i, str(fee)]
+
+# ----------------------------
+# WITHDRAWALORTOPUPTRANSACTION (t601 – t900 at scale 1)
+# ----------------------------
+wot_header = ["transactionid", "type"]
+
+def generate_withdrawal_topups(blocks):
+    for ids, num_guaranteed in zip(transaction_ids(blocks, 2), blocks["topups"].tolist()):
+        for i in ids:
+            if i < ids.start + num_guaranteed:  # guaranteed top-ups
+                yield [i, "topup"]
+            else:
+                ttype = random.choice(["topup", "withdrawal"])
+                yield [i, ttype]
+
+# ----------------------------
+# POSTTRADECOMPANY (If needed)
+# ----------------------------
+posttrade_header = ["companyid", "companyname", "region"]
+
+def generate_posttrade_companies():
+    for cid in range(1, 16):
+        cname = random.choice(brokerage_names)
+        reg = random.choice(regions)
+        yield [cid, cname, reg]
+
+# ----------------------------
+# X. COMBINING RISK ASSESSMENT
+# Written in the same pass as RISKASSESSMENT1.
+# ----------------------------
+combined_ra_header = ["phonenumber", "datetime", "question1", "question2", "question3", "question4", "question5", "risktolerance"]
+
+def combine_risk_assessment(chunk):
+    return [row + [risk_tolerance(row[2:7])] for row in chunk]
+
+# ----------------------------
+# XI. REPAIR PORTFOLIO:
+# Write repaired_portfolio with the final 'annualisedreturn' of every portfolio taken
+# from its last PERFORMANCE record. The portfolio columns follow from the invested
+# values kept for PERFORMANCE and the latest records from LatestReturns, so nothing
+# is read back from disk.
+# ----------------------------
+repaired_port_header = ["portfolioid", "portfoliofee", "goalid", "annualisedreturn"]
+
+def generate_repaired_portfolios(invested_values, latest):
+    for k, (invested, annualreturns) in enumerate(zip(invested_values, latest.returns.tolist()), start=1):
+        annualisedreturn = None if annualreturns != annualreturns else str(annualreturns)  # NaN: no performance
+        yield [k, str(portfolio_fee(invested)), k, annualisedreturn]
+
+# ----------------------------
+# XII. REPAIR RISK ASSESSMENTS AND MARKET TRANSACTIONS:
+# repaired_riskassessment_combined is riskassessment_combined with the investor
+# columns of each row's phonenumber joined on. Its rows are spelled again from the
+# investor index and answer code the riskassessment task kept per assessment, and
+# the investor columns from the draws the investor task kept, so the join is an
+# array lookup instead of a merge of the two files.
+# repaired_markettransaction holds every transaction that is not a withdrawal or
+# top-up as a market transaction: the market ones with their companyid, then the
+# rebalancing ones (the rest, by the id layout) with a random companyid.
+# ----------------------------
+repaired_ra_header = combined_ra_header + investor_header[1:]
+DATE_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+def generate_repaired_risk_assessments(assessments, investors):
+    investor_idx = np.asarray(assessments["investor"], dtype=np.int64)
+    codes = np.asarray(assessments["code"], dtype=np.int64)
+    columns = {column: np.asarray(values) for column, values in investors.items()}
+    first_names_, last_names_ = np.array(first_names, dtype=object), np.array(last_names, dtype=object)
+    base = np.datetime64(base_dt, "s")
+    for start in range(0, len(codes), CHUNK_ROWS):
+        i = np.arange(start, min(start + CHUNK_ROWS, len(codes)))
+        k, code = investor_idx[i], codes[i]
+        first, last = first_names_[columns["first"][k]], last_names_[columns["last"][k]]
+        number = np.array(str_column(k + 1), dtype=object)
+        dob = (columns["dob"][k] - DATE_EPOCH_ORDINAL).astype("datetime64[D]")
+        yield list(zip(
+            str_column(columns["phone"][k]), format_datetimes(base + assessment_seconds(i)),
+            *(letters[code].tolist() for letters in ANSWER_LETTERS), RISK_TOLERANCES[RISK_LOOKUP[code]].tolist(),
+            (first + " " + last).tolist(), np.datetime_as_string(dob).tolist(),
+            np.array(genders)[columns["gender"][k]].tolist(), (first + "." + last + number + "@example.com").tolist(),
+            str_column(columns["income"][k]), np.array(investor_companies)[columns["company"][k]].tolist(),
+            ("client " + number).tolist(),
+        ))
+
+def generate_repaired_market_transactions(blocks, market_companies):
+    yield from map(list, zip(chain.from_iterable(transaction_ids(blocks, 0)), market_companies))
+    for i in chain.from_iterable(transaction_ids(blocks, 1)):
+        yield [i, random.randint(1, 15)]
+# ----------------------------
+# XIII. SPLIT PERFORMANCE CSV INTO performance1 / 2 / 3
+# ----------------------------
+performance1_header = ["portfolioid", "investedvalue"]
+performance2_header = ["portfolioid", "datetime", "annualreturns", "dailychange", "gainloss"]
+performance3_header = ["gainloss", "investedvalue", "marketvalue"]
+performance2_columns = itemgetter(0, 1, 3, 4, 5)
+performance3_columns = itemgetter(5, 2, 6)
+
+def run_starts(values):
+    """Indices where a run of equal values starts."""
+    values = np.asarray(values)
+    return np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1]))).tolist()
+
+class KeySet:
+    """
+    Set of int64 keys in one open-addressing NumPy table (linear probing, at most
+    half full), so a key costs about 16 bytes instead of the ~70 of a Python set
+    entry. Keys are added a whole array at a time.
+    """
+    EMPTY = np.iinfo(np.int64).min
+
+    def __init__(self, capacity=1 << 16):
+        self.slots = np.full(capacity, self.EMPTY, dtype=np.int64)
+        self.size = 0
+
+    def slot_of(self, keys):
+        bits = np.uint64(64 - (len(self.slots).bit_length() - 1))
+        return ((keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> bits).astype(np.int64)
+
+    def insert(self, keys):
+        """Insert distinct keys; returns a mask of the ones that were not in the set yet."""
+        new = np.zeros(len(keys), dtype=bool)
+        pending = np.arange(len(keys))
+        pos = self.slot_of(keys)
+        mask = len(self.slots) - 1
+        while len(pending):
+            found = self.slots[pos]
+            empty = found == self.EMPTY
+            # Of the pending keys probing the same empty slot, the first one takes it;
+            # the others look at that slot again in the next round
+            candidates = np.flatnonzero(empty)
+            _, first = np.unique(pos[candidates], return_index=True)
+            winners = candidates[first]
+            self.slots[pos[winners]] = keys[pending[winners]]
+            new[pending[winners]] = True
+            done = found == keys[pending]
+            done[winners] = True
+            moving = ~done & ~empty
+            pos[moving] = (pos[moving] + 1) & mask
+            pending, pos = pending[~done], pos[~done]
+        self.size += int(new.sum())
+        return new
+
+    def add(self, keys):
+        """Add an array of keys; returns a mask of the first occurrence of each key not seen before."""
+        keys = np.asarray(keys, dtype=np.int64)
+        if 2 * (self.size + len(keys)) > len(self.slots):
+            old = self.slots[self.slots != self.EMPTY]
+            capacity = len(self.slots)
+            while 2 * (self.size + len(keys)) > capacity:
+                capacity *= 2
+            self.slots = np.full(capacity, self.EMPTY, dtype=np.int64)
+            self.size = 0
+            self.insert(old)
+        unique, first = np.unique(keys, return_index=True)
+        new = np.zeros(len(keys), dtype=bool)
+        new[first[self.insert(unique)]] = True
+        return new
+
+def split_performance_chunks(chunks):
+    """
+    Project PERFORMANCE chunks onto performance1/2/3 in one pass, yielding the three
+    row lists of every chunk. investedvalue depends on portfolioid alone, so
+    performance1 keeps the first row of each portfolio, remembered in a set of
+    portfolio ids. performance3 keeps the first row of each (gainloss, investedvalue),
+    packed into one int64 and remembered in a KeySet; a later row with the same key
+    but another marketvalue would break the FD and is dropped with it.
+    """
+    portfolios = set()
+    gain_keys = KeySet()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        columns = list(zip(*chunk))
+        # Only the first row of each run of one portfolio can be its first row overall
+        pids = columns[0]
+        performance1 = []
+        for i in run_starts(pids):
+            if pids[i] not in portfolios:
+                portfolios.add(pids[i])
+                performance1.append((pids[i], columns[2][i]))
+        invested = np.array(columns[2], dtype=np.int64)
+        gainloss = np.array(columns[5], dtype=np.int64)
+        new = gain_keys.add((invested << 32) + gainloss)  # exact while investedvalue and |gainloss| < 2**31
+        performance3 = list(map(performance3_columns, map(chunk.__getitem__, np.flatnonzero(new).tolist())))
+        yield performance1, list(map(performance2_columns, chunk)), performance3
+
+def split_performance_csv(cfg, names=("performance",)):
+    """
+    Stream the performance file (or its shard files) once and write
+    performance1: (portfolioid, investedvalue), performance2: (portfolioid, datetime,
+    annualreturns, dailychange, gainloss) and performance3: (gainloss, investedvalue,
+    marketvalue) side by side in the output format; returns the performance2 row count.
+    The values are copied through as read, so datetimes are never re-parsed.
+    """
+    if cfg["format"] == "sqlite":
+        names = ["performance"]  # the shards were all loaded into one table
+    parts = split_performance_chunks(chunk for name in names for chunk in read_chunks(cfg, name))
+    # "\n" line ends, as these files had when pandas wrote them
+    parts = also_write_rows(cfg, parts, "performance1", performance1_header, itemgetter(0), "\n")
+    parts = also_write_rows(cfg, parts, "performance3", performance3_header, itemgetter(2), "\n")
+    with gc_paused():
+        return write_rows(cfg, "performance2", performance2_header, map(itemgetter(1), parts), "\n")
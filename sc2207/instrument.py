@@ -0,0 +1,147 @@
+import cProfile
+import json
+import os
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# ----------------------------
+# INSTRUMENTATION (--instrument or SC2207_INSTRUMENT)
+# Every task runs as a named stage (investor, performance, ..., split_performance).
+# With "stats" a stage records its wall and CPU time, the calls it made to `random`
+# and to its NumPy Generator, and the rows it wrote; "memory" adds tracemalloc's
+# peak, the allocated blocks still alive at the end and the top allocation sites;
+# "cprofile" and "pyinstrument" also dump a profile of the stage. Each stage writes
+# instrumentation/<task>.json itself, so pool workers need no way back to main().
+# ----------------------------
+INSTRUMENT_DIR = "instrumentation"
+INSTRUMENT_OPTIONS = ["stats", "memory", "cprofile", "pyinstrument"]
+RANDOM_FUNCTIONS = ["random", "uniform", "randint", "randrange", "choice", "choices", "sample", "shuffle",
+                    "gauss", "getrandbits"]
+
+# Calls to the NumPy Generator of the stage running in this process, or None
+stage_numpy_calls = None
+
+def instrument_options(value):
+    """Parse a comma-separated --instrument / SC2207_INSTRUMENT value; every option implies "stats"."""
+    options = {option.strip() for option in value.split(",") if option.strip()}
+    unknown = options - set(INSTRUMENT_OPTIONS)
+    if unknown:
+        raise ValueError(f"unknown instrumentation {', '.join(sorted(unknown))} (choose from {', '.join(INSTRUMENT_OPTIONS)})")
+    return sorted(options | {"stats"}) if options else []
+
+class CountingGenerator:
+    """Wraps a NumPy Generator, counting calls to each of its methods into `counts`."""
+
+    def __init__(self, rng, counts):
+        self.rng = rng
+        self.counts = counts
+
+    def __getattr__(self, name):
+        attr = getattr(self.rng, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self.counts[name] = self.counts.get(name, 0) + 1
+            return attr(*args, **kwargs)
+        return counted
+
+@contextmanager
+def counting_random(counts):
+    """Count calls to the module-level `random` functions into `counts` (the draws are unchanged)."""
+    originals = {name: getattr(random, name) for name in RANDOM_FUNCTIONS}
+
+    def counter(name, function):
+        def counted(*args, **kwargs):
+            counts[name] = counts.get(name, 0) + 1
+            return function(*args, **kwargs)
+        return counted
+
+    for name, function in originals.items():
+        setattr(random, name, counter(name, function))
+    try:
+        yield
+    finally:
+        for name, function in originals.items():
+            setattr(random, name, function)
+
+@contextmanager
+def stage(name, cfg, checkpoint=None):
+    """Run the body as the stage `name`, instrumented as cfg["instrument"] asks."""
+    global stage_numpy_calls
+    options = cfg.get("instrument") or []
+    if not options:
+        yield
+        return
+    stem = os.path.join(INSTRUMENT_DIR, name.replace("/", "-"))
+    stats = {"stage": name, "random_calls": {}, "numpy_calls": {}}
+    stage_numpy_calls = stats["numpy_calls"]
+    if "memory" in options:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+    profiler = None
+    if "cprofile" in options:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif "pyinstrument" in options:
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        with counting_random(stats["random_calls"]):
+            yield
+    finally:
+        stats["seconds"] = time.perf_counter() - wall
+        stats["cpu_seconds"] = time.process_time() - cpu
+        stage_numpy_calls = None
+        if "cprofile" in options:
+            profiler.disable()
+            profiler.dump_stats(stem + ".prof")
+        elif "pyinstrument" in options:
+            profiler.stop()
+            with open(stem + ".html", "w") as f:
+                f.write(profiler.output_html())
+        if "memory" in options:
+            after = tracemalloc.take_snapshot()
+            stats["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            diff = after.compare_to(before, "lineno")
+            stats["allocated_blocks"] = sum(d.count_diff for d in diff)
+            stats["top_allocations"] = [{"where": str(d.traceback), "bytes": d.size_diff, "blocks": d.count_diff}
+                                        for d in diff[:5]]
+        files = checkpoint.state["files"] if checkpoint else {}
+        stats["rows"] = sum(progress["rows"] for progress in files.values()) if files else None
+        stats["random_call_total"] = sum(stats["random_calls"].values())
+        stats["numpy_call_total"] = sum(stats["numpy_calls"].values())
+        with open(stem + ".json", "w") as f:
+            json.dump(stats, f, indent=2)
+
+def stage_path(name):
+    return os.path.join(INSTRUMENT_DIR, name.replace("/", "-") + ".json")
+
+def reset_stages(tasks):
+    """Remove the stage files an earlier run left, so report_stages only sees this run's."""
+    os.makedirs(INSTRUMENT_DIR, exist_ok=True)
+    for name in tasks:
+        if os.path.exists(stage_path(name)):
+            os.remove(stage_path(name))
+
+def report_stages(tasks):
+    """Collect the stage files of this run into instrumentation/stages.json and print a summary."""
+    stages = []
+    for name in tasks:
+        path = stage_path(name)
+        if os.path.exists(path):  # stages reused from a checkpoint did not run
+            with open(path) as f:
+                stages.append(json.load(f))
+    with open(os.path.join(INSTRUMENT_DIR, "stages.json"), "w") as f:
+        json.dump(stages, f, indent=2)
+    print(f"{'stage':<30} {'wall s':>8} {'cpu s':>8} {'rows':>12} {'random':>12} {'numpy':>8}")
+    for s in stages:
+        rows = "-" if s["rows"] is None else f"{s['rows']:,}"
+        print(f"{s['stage']:<30} {s['seconds']:>8.2f} {s['cpu_seconds']:>8.2f} {rows:>12} "
+              f"{s['random_call_total']:>12,} {s['numpy_call_total']:>8,}")
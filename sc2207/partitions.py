@@ -0,0 +1,94 @@
+import zlib
+import numpy as np
+
+from .formats import KEY_PREFIXES, format_datetimes, format_key
+from .generators import date_range, guaranteed_topups, transaction_blocks, transaction_window
+
+# ----------------------------
+# PARTITIONED OUTPUT (--partition-by hash|month, numpy engine)
+# PERFORMANCE and TRANSACTION can be written as shard files under performance/
+# and transaction/, each generated by its own task, plus a manifest.json with the
+# row count and key ranges of every shard. Every shard task derives the same plan
+# from the seed, so shards can be generated independently and in any order. A
+# month shard draws from a stream keyed by its calendar month, and a TRANSACTION
+# month shard holds the transaction id block of its month (transaction_blocks),
+# dated within that month, so a month comes out the same whatever --end is.
+# A hash shard of PERFORMANCE returns the latest records of its own portfolios.
+# A month shard returns none: every portfolio has a record in every month, so the
+# latest ones are all in the last month, whose draws the join replays.
+# ----------------------------
+def portfolio_shard(portfolio_numbers, num_shards):
+    """Hash shard of each 1-based portfolio number: murmur3's fmix32 finalizer mod num_shards."""
+    h = np.asarray(portfolio_numbers, dtype=np.uint64) & 0xFFFFFFFF
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & 0xFFFFFFFF
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & 0xFFFFFFFF
+    h ^= h >> 16
+    return h % num_shards
+
+def performance_plan(cfg, num_portfolios):
+    """One dict per PERFORMANCE shard: file name, portfolio indices and months."""
+    months = date_range(cfg)
+    if cfg["partition_by"] == "hash":
+        owner = portfolio_shard(np.arange(1, num_portfolios + 1), cfg["shards"])
+        return [{"name": f"shard-{k:03d}", "portfolios": np.flatnonzero(owner == k), "months": months}
+                for k in range(cfg["shards"])]
+    return [{"name": str(m), "portfolios": None, "months": [m]} for m in months]
+
+def month_stream(month):
+    """Stream number of a month shard: its month since 1970-01, so it does not depend on --start."""
+    return int((np.datetime64(month, "M") - np.datetime64("1970-01", "M")).astype(np.int64))
+
+def transaction_plan(cfg, num_portfolios):
+    """
+    One dict per TRANSACTION shard: file name, transaction numbers, portfolio pool
+    (hash partitioning) and date window, in minutes from `base`. A month shard
+    holds its month's id block and the whole of its month. For hash shards the
+    number of rows of each type in each shard is a multinomial draw from a
+    dedicated layout stream, so each type keeps its id range and every shard task
+    computes the same plan.
+    """
+    if cfg["partition_by"] == "month":
+        blocks = transaction_blocks(cfg)
+        months = date_range(cfg)
+        starts = np.append(months, months[-1] + 1).astype("datetime64[m]")
+        lengths = np.diff(starts).astype(np.int64).tolist()  # minutes in each month
+        return [{"name": str(month), "tnums": np.arange(first, first + 3 * count), "portfolios": None,
+                 "base": start, "window": (0, length)}
+                for month, start, length, first, count in zip(months, starts, lengths, blocks["first"].tolist(),
+                                                              blocks["count"].tolist())]
+
+    n = cfg["n_per_type"]
+    k_guaranteed = guaranteed_topups(cfg)
+    base, length = transaction_window(cfg)
+    owner = portfolio_shard(np.arange(1, num_portfolios + 1), cfg["shards"])
+    pools = [np.flatnonzero(owner == k) for k in range(cfg["shards"])]
+    weights = np.array([len(pool) for pool in pools]) / num_portfolios
+    guaranteed_shard = np.full(k_guaranteed, owner[0])  # with topup_portfolio "first" they all go to p001
+
+    layout_rng = np.random.default_rng(np.random.SeedSequence(cfg["seed"], spawn_key=(zlib.crc32(b"transaction-layout"),)))
+    # market, rebalancing and the non-guaranteed withdrawal/topup rows
+    type_starts = [1, n + 1, 2 * n + k_guaranteed + 1]
+    type_counts = [layout_rng.multinomial(c, weights) for c in (n, n, n - k_guaranteed)]
+    if cfg["topup_portfolio"] == "random":
+        guaranteed_shard = layout_rng.choice(cfg["shards"], size=k_guaranteed, p=weights)
+    plan = []
+    for k in range(cfg["shards"]):
+        market, rebalancing, withdrawal = (
+            np.arange(first + counts[:k].sum(), first + counts[:k + 1].sum())
+            for first, counts in zip(type_starts, type_counts))
+        guaranteed = 2 * n + 1 + np.flatnonzero(guaranteed_shard == k)
+        plan.append({"name": f"shard-{k:03d}", "tnums": np.concatenate([market, rebalancing, guaranteed, withdrawal]),
+                     "portfolios": pools[k], "base": base, "window": (0, length)})
+    return plan
+
+def shard_entry(cfg, filename, rows, ranges):
+    """Manifest entry for one shard, with key ranges formatted as they appear in the file."""
+    formatted = {}
+    for column, (lo, hi) in ranges.items():
+        if column in KEY_PREFIXES:
+            formatted[column] = format_key(cfg, column, [int(lo), int(hi)])
+        else:
+            formatted[column] = format_datetimes(np.array([lo, hi]))
+    return {"file": filename, "rows": rows, "ranges": formatted}
@@ -0,0 +1,30 @@
+# ----------------------------
+# PROFILES
+# The denzel/ and ganqingrong/ copies of the generator drifted apart; each profile
+# names the variant one of them writes, so both sets of files come out of the same
+# generator (byte for byte with --engine python and seed 42):
+#   engine             default --engine
+#   columns            table: the generated columns it writes, in file order
+#   renames            table: {generated column: its name in the file}
+#   skip               tasks (see TABLES) it does not run
+#   birth_years        range of INVESTOR birth years
+#   topup_portfolio    "first": the monthly top-ups all go to p001; "random": any portfolio
+# ----------------------------
+PROFILES = {
+    "denzel": {
+        "engine": "numpy",
+        "columns": {"portfolio": ["portfolioid", "annualisedreturn", "portfoliofee", "goalid"]},
+        "renames": {},
+        "skip": [],
+        "birth_years": [1960, 2005],
+        "topup_portfolio": "first",
+    },
+    "ganqingrong": {
+        "engine": "python",
+        "columns": {"financialgoal": ["goalid", "goalname", "timeline", "amountofmoney", "phonenumber"]},
+        "renames": {"stocks": {"ebdta": "ebita"}},
+        "skip": ["posttradecompany", "repair_portfolio", "split_performance"],
+        "birth_years": [1974, 2006],
+        "topup_portfolio": "random",
+    },
+}
@@ -0,0 +1,148 @@
+import time
+
+from .formats import (
+    DATE_COLUMNS, FLOAT_COLUMNS, INT_COLUMNS, TIMESTAMP_COLUMNS, sqlite_connection, table_columns
+)
+from .generators import (
+    asset_header, bonds1_header, bonds2_header, cash_header, combined_ra_header, commodity_header, fg_header,
+    funds_header, investor_header, mt_header, perf_header, performance1_header, performance2_header,
+    performance3_header, port_header, posttrade_header, ra1_header, ra2_header, repaired_port_header,
+    repaired_ra_header, rt_header, stocks_header, trans_header, wot_header
+)
+
+# ----------------------------
+# DATABASE SCHEMA (--format sqlite|pgcopy)
+# Keys of the 3NF schema, parents first. The DDL is built from the table headers
+# (as the profile writes them, see table_schemas) and the column type sets of formats.py. Every foreign key that its table's primary key
+# does not cover gets a secondary index, built only once the data is loaded.
+# ----------------------------
+answer_columns = ("question1", "question2", "question3", "question4", "question5")
+
+# table: (columns, primary key, {foreign key columns: referenced table})
+TABLE_SCHEMAS = {
+    "investor": (investor_header, ("phonenumber",), {}),
+    "riskassessment2": (ra2_header, answer_columns, {}),
+    "riskassessment1": (ra1_header, ("phonenumber", "datetime"),
+                        {("phonenumber",): "investor", answer_columns: "riskassessment2"}),
+    "riskassessment_combined": (combined_ra_header, ("phonenumber", "datetime"), {("phonenumber",): "investor"}),
+    "repaired_riskassessment_combined": (repaired_ra_header, ("phonenumber", "datetime"),
+                                         {("phonenumber",): "investor"}),
+    "financialgoal": (fg_header, ("goalid",), {("phonenumber",): "investor"}),
+    "portfolio": (port_header, ("portfolioid",), {("goalid",): "financialgoal"}),
+    "repaired_portfolio": (repaired_port_header, ("portfolioid",), {("goalid",): "financialgoal"}),
+    "performance": (perf_header, ("portfolioid", "datetime"), {("portfolioid",): "portfolio"}),
+    "performance1": (performance1_header, ("portfolioid",), {("portfolioid",): "portfolio"}),
+    "performance2": (performance2_header, ("portfolioid", "datetime"), {("portfolioid",): "performance1"}),
+    "performance3": (performance3_header, ("gainloss", "investedvalue"), {}),
+    "asset": (asset_header, ("assetid",), {("portfolioid",): "portfolio"}),
+    "funds": (funds_header, ("assetid",), {("assetid",): "asset"}),
+    "cash": (cash_header, ("assetid",), {("assetid",): "asset"}),
+    "bonds2": (bonds2_header, ("bondname",), {}),
+    "bonds1": (bonds1_header, ("assetid",), {("assetid",): "asset", ("bondname",): "bonds2"}),
+    "commodity": (commodity_header, ("assetid",), {("assetid",): "asset"}),
+    "stocks": (stocks_header, ("assetid",), {("assetid",): "asset"}),
+    "posttradecompany": (posttrade_header, ("companyid",), {}),
+    "transaction": (trans_header, ("transactionid",), {("portfolioid",): "portfolio", ("assetid",): "asset"}),
+    "markettransaction": (mt_header, ("transactionid",),
+                          {("transactionid",): "transaction", ("companyid",): "posttradecompany"}),
+    "rebalancingtransaction": (rt_header, ("transactionid",), {("transactionid",): "transaction"}),
+    "withdrawalortopuptransaction": (wot_header, ("transactionid",), {("transactionid",): "transaction"}),
+    "repaired_markettransaction": (mt_header, ("transactionid",),
+                                   {("transactionid",): "transaction", ("companyid",): "posttradecompany"}),
+}
+
+# The tables a task writes, where they are not just the task's own name
+TASK_TABLES = {
+    "riskassessment": ["riskassessment1", "riskassessment2", "riskassessment_combined"],
+    "repair_portfolio": ["repaired_portfolio"],
+    "repair_riskassessment": ["repaired_riskassessment_combined"],
+    "repair_transaction": ["repaired_markettransaction"],
+    "split_performance": ["performance1", "performance2", "performance3"],
+}
+
+def table_schemas(cfg):
+    """TABLE_SCHEMAS with the columns of the profile of cfg, without the tables it skips or the keys into them."""
+    skipped = {table for task in cfg["skip"] for table in TASK_TABLES.get(task, [task])}
+    schemas = {}
+    for table, (columns, primary_key, references) in TABLE_SCHEMAS.items():
+        if table not in skipped:
+            schemas[table] = (table_columns(cfg, table, columns)[0], primary_key,
+                              {fk: parent for fk, parent in references.items() if parent not in skipped})
+    return schemas
+
+def sql_type(column):
+    if column in INT_COLUMNS:
+        return "BIGINT"
+    if column in FLOAT_COLUMNS:
+        return "DOUBLE PRECISION"
+    if column in TIMESTAMP_COLUMNS:
+        return "TIMESTAMP"
+    if column in DATE_COLUMNS:
+        return "DATE"
+    return "TEXT"
+
+def foreign_key_sql(columns, parent):
+    return f'FOREIGN KEY ({", ".join(columns)}) REFERENCES "{parent}" ({", ".join(columns)})'
+
+def create_table_sql(table, schema, foreign_keys=True):
+    """CREATE TABLE for one table; PostgreSQL and SQLite both accept the type names."""
+    columns, primary_key, references = schema
+    lines = [f"    {column} {sql_type(column)}" for column in columns]
+    lines.append(f"    PRIMARY KEY ({', '.join(primary_key)})")
+    if foreign_keys:
+        lines += ["    " + foreign_key_sql(fk, parent) for fk, parent in references.items()]
+    return f'CREATE TABLE "{table}" (\n' + ",\n".join(lines) + "\n);"
+
+def index_sql(table, schema):
+    """CREATE INDEX for each foreign key of `table` that is not a prefix of its primary key."""
+    _, primary_key, references = schema
+    return [f'CREATE INDEX "{table}_{"_".join(fk)}_idx" ON "{table}" ({", ".join(fk)});'
+            for fk in references if primary_key[:len(fk)] != fk]
+
+def create_sqlite_schema(cfg):
+    """Recreate every table, without its secondary indexes, in a WAL-mode database."""
+    conn = sqlite_connection(cfg["database"])
+    conn.execute("PRAGMA journal_mode = WAL")
+    for table in reversed(TABLE_SCHEMAS):
+        conn.execute(f'DROP TABLE IF EXISTS "{table}"')  # drops its indexes too
+    for table, schema in table_schemas(cfg).items():
+        conn.execute(create_table_sql(table, schema))
+
+def index_sqlite(cfg):
+    """Build the secondary indexes after the load and check every foreign key once."""
+    conn = sqlite_connection(cfg["database"])
+    start = time.perf_counter()
+    for table, schema in table_schemas(cfg).items():
+        for statement in index_sql(table, schema):
+            conn.execute(statement)
+    print(f"Built the indexes of {cfg['database']} in {time.perf_counter() - start:.2f}s.")
+    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+    if violations:
+        print(f"Warning: {len(violations)} foreign key violations, e.g. {violations[:5]}")
+    conn.execute("ANALYZE")
+
+def write_pg_scripts(cfg, results):
+    """
+    schema.sql (tables with primary keys only), constraints.sql (foreign keys and
+    indexes) and load.sql, which runs both around every COPY script in one
+    transaction: `psql -f load.sql`.
+    """
+    schemas = table_schemas(cfg)
+    with open("schema.sql", "w") as f:
+        for table in schemas:
+            f.write(f'DROP TABLE IF EXISTS "{table}" CASCADE;\n')
+        for table, schema in schemas.items():
+            f.write(create_table_sql(table, schema, foreign_keys=False) + "\n")
+    with open("constraints.sql", "w") as f:
+        for table, schema in schemas.items():
+            for fk, parent in schema[2].items():
+                f.write(f'ALTER TABLE "{table}" ADD {foreign_key_sql(fk, parent)};\n')
+            for statement in index_sql(table, schema):
+                f.write(statement + "\n")
+    with open("load.sql", "w") as f:
+        f.write("\\set ON_ERROR_STOP on\nBEGIN;\n\\ir schema.sql\n")
+        for table in schemas:
+            sharded = table in ("performance", "transaction")
+            files = [entry["file"] for entry in results[table]["shards"]] if sharded else [table + ".copy.sql"]
+            f.writelines(f"\\ir {filename}\n" for filename in files)
+        f.write("\\ir constraints.sql\nCOMMIT;\nANALYZE;\n")
@@ -0,0 +1,464 @@
+import json
+import os
+import random
+import zlib
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from operator import itemgetter
+import numpy as np
+
+from . import instrument
+from .formats import also_write_rows, also_write_table, chunked, table_filename, write_rows, write_table
+from .generators import (
+    LatestReturns, RISK_LOOKUP, allocated_phones, assessment_arrays, asset_header, asset_holdings,
+    asset_start_values, asset_subclass_bounds, bonds1_header, bonds2_header, cash_header,
+    collect_risk_combos, combine_risk_assessment, combined_ra_header, commodity_header, date_range,
+    fg_header, funds_header, generate_assets, generate_bonds1, generate_bonds2, generate_cash,
+    generate_commodities, generate_funds, generate_goals, generate_investors, generate_market_transactions,
+    generate_performance, generate_performance_numpy, generate_performance_valued, generate_performance_walk,
+    generate_portfolios, generate_posttrade_companies, generate_rebalancing_transactions,
+    generate_repaired_market_transactions, generate_repaired_portfolios, generate_repaired_risk_assessments,
+    generate_risk_assessments, generate_risk_assessments_numpy, generate_stocks, generate_transactions,
+    generate_transactions_numpy, generate_withdrawal_topups, investor_arrays, investor_header, mt_header,
+    perf_header, phone_keys, port_header, posttrade_header, ra1_header, ra2_header, repaired_port_header,
+    repaired_ra_header, risk_rubric, rt_header, simulate_prices, split_performance_csv, stocks_header,
+    trans_header, transaction_blocks, transaction_kinds, transaction_window, walk_range, wot_header
+)
+from .partitions import month_stream, performance_plan, shard_entry, transaction_plan
+from .checkpoints import CHECKPOINT_DIR, TaskCheckpoint, task_keys
+from .instrument import CountingGenerator, stage
+
+# ----------------------------
+# TABLE DEPENDENCY GRAPH
+# Each task writes one table (or a table and the file derived from it in the same
+# pass) and returns only the compact keys its dependents need. TABLES is listed in
+# the original script order, which is also a valid topological order.
+# ----------------------------
+def table_rng(cfg, table, shard=None):
+    """
+    Seed `random` and return a NumPy Generator for one table (or one shard of it).
+    With the numpy engine every table has its own stream derived from (seed, table
+    name[, shard]), so output does not depend on the number of workers or the order
+    tasks finish in. The python engine keeps the single global stream of the
+    original script.
+    """
+    if cfg["engine"] == "python":
+        return None
+    key = (zlib.crc32(table.encode()),) if shard is None else (zlib.crc32(table.encode()), shard)
+    ss = np.random.SeedSequence(cfg["seed"], spawn_key=key)
+    random.seed(int(ss.generate_state(1, np.uint64)[0]))
+    rng = np.random.default_rng(ss)
+    return rng if instrument.stage_numpy_calls is None else CountingGenerator(rng, instrument.stage_numpy_calls)
+
+def run_investor(cfg, deps):
+    rng = table_rng(cfg, "investor")
+    allocated = None if rng is None else allocated_phones(cfg["num_investors"], phone_keys(rng))
+    investors = investor_arrays()
+    write_table(cfg, "investor", investor_header, chunked(generate_investors(
+        cfg["num_investors"], investors, allocated, cfg["birth_years"])))
+    return investors
+
+ra1_columns = itemgetter(*range(len(ra1_header)))
+
+def run_riskassessment(cfg, deps):
+    rng = table_rng(cfg, "riskassessment")
+    assessments = assessment_arrays()
+    if rng is not None:
+        seen = np.zeros(len(RISK_LOOKUP), dtype=bool)
+        combined = also_write_rows(cfg, generate_risk_assessments_numpy(
+            cfg["num_risk_assessments"], deps["investor"]["phone"], rng, seen, assessments),
+            "riskassessment_combined", combined_ra_header, lambda chunk: chunk)
+        write_rows(cfg, "riskassessment1", ra1_header, (list(map(ra1_columns, chunk)) for chunk in combined))
+        write_rows(cfg, "riskassessment2", ra2_header, [risk_rubric(seen)])
+        return assessments
+    unique_risk = {}
+    write_table(cfg, "riskassessment1", ra1_header, collect_risk_combos(
+        also_write_table(cfg, chunked(generate_risk_assessments(
+                             cfg["num_risk_assessments"], deps["investor"]["phone"], assessments)),
+                         "riskassessment_combined", combined_ra_header, combine_risk_assessment),
+        unique_risk))
+    write_table(cfg, "riskassessment2", ra2_header, [[list(key) + [rt] for key, rt in unique_risk.items()]])
+    return assessments
+
+def run_financialgoal(cfg, deps):
+    table_rng(cfg, "financialgoal")
+    return write_table(cfg, "financialgoal", fg_header, chunked(generate_goals(deps["investor"]["phone"])))
+
+def run_portfolio(cfg, deps):
+    table_rng(cfg, "portfolio")
+    invested_values = array("i")
+    write_table(cfg, "portfolio", port_header, chunked(generate_portfolios(deps["financialgoal"], invested_values)))
+    return invested_values
+
+def run_performance(cfg, deps):
+    rng = table_rng(cfg, "performance")
+    latest = LatestReturns(len(deps["portfolio"]))
+    if cfg["performance"] == "valued":
+        start, days = walk_range(cfg)
+        chunks = generate_performance_valued(asset_holdings(deps, start), deps["prices"], latest, start, days,
+                                             cfg["steps_per_day"])
+    elif cfg["performance"] == "walk":
+        chunks = generate_performance_walk(deps["portfolio"], rng, latest, *walk_range(cfg), cfg["steps_per_day"])
+    elif cfg["engine"] == "numpy":
+        chunks = generate_performance_numpy(deps["portfolio"], rng, latest, date_range(cfg))
+    else:
+        months = [(m.year, m.month) for m in date_range(cfg).tolist()]
+        chunks = chunked(generate_performance(deps["portfolio"], latest, months))
+    rows = write_table(cfg, "performance", perf_header, chunks)
+    return {"tables": ["performance"], "latest": latest,
+            "shards": [{"file": table_filename(cfg, "performance"), "rows": rows}]}
+
+def run_performance_shard(cfg, deps, shard):
+    plan = performance_plan(cfg, len(deps["portfolio"]))[shard]
+    # a month shard's stream is keyed by its month, so months can be added to the range later
+    rng = table_rng(cfg, "performance", month_stream(plan["months"][0]) if cfg["partition_by"] == "month" else shard)
+    latest = LatestReturns(len(deps["portfolio"]), plan["portfolios"])
+    ranges = {}
+    name = os.path.join("performance", plan["name"])
+    if cfg["performance"] == "valued":
+        start, days = walk_range(cfg)
+        chunks = generate_performance_valued(asset_holdings(deps, start), deps["prices"], latest, start, days,
+                                             cfg["steps_per_day"], plan["portfolios"], ranges)
+    elif cfg["performance"] == "walk":
+        chunks = generate_performance_walk(deps["portfolio"], rng, latest, *walk_range(cfg), cfg["steps_per_day"],
+                                           plan["portfolios"], ranges)
+    else:
+        chunks = generate_performance_numpy(deps["portfolio"], rng, latest, plan["months"], plan["portfolios"],
+                                            ranges)
+    rows = write_table(cfg, name, perf_header, chunks)
+    entry = shard_entry(cfg, table_filename(cfg, name), rows, ranges)
+    entry["table"] = name
+    if cfg["partition_by"] == "hash":
+        entry["latest"] = latest
+    return entry
+
+def run_performance_join(cfg, deps):
+    """
+    Collect the manifest entries of the PERFORMANCE shards, in shard order, and
+    the latest records: merged from the hash shards, or replayed from the draws of
+    the last month (see PARTITIONED OUTPUT).
+    """
+    shards = [deps[name] for name in sorted(deps) if name.startswith("performance/")]
+    latest = LatestReturns(len(deps["portfolio"]))
+    if cfg["partition_by"] == "hash":
+        for entry in shards:
+            latest.merge(entry.pop("latest"))
+    else:
+        month = date_range(cfg)[-1:]
+        for _ in generate_performance_numpy(deps["portfolio"], table_rng(cfg, "performance", month_stream(month[0])),
+                                            latest, month):
+            pass
+    return {"tables": [entry.pop("table") for entry in shards], "latest": latest, "shards": shards}
+
+def run_prices(cfg, deps):
+    """The shared price paths of --performance valued; writes no table."""
+    return simulate_prices(table_rng(cfg, "prices"), walk_range(cfg)[1], cfg["steps_per_day"])
+
+def run_asset(cfg, deps):
+    """The portfolio index and allocationratio of every asset."""
+    table_rng(cfg, "asset")
+    owners, allocations = array("i"), array("d")
+    write_table(cfg, "asset", asset_header,
+                chunked(generate_assets(len(deps["portfolio"]), cfg["num_assets"], owners, allocations)))
+    return {"portfolio": owners, "allocationratio": allocations}
+
+# The subclass tasks return what the valuation engine (section 6c) prices their assets on;
+# with --performance valued they also get the portfolios, to derive their unit columns
+def unit_values(cfg, deps, subclass):
+    return asset_start_values(deps, subclass) if cfg["performance"] == "valued" else None
+
+def run_funds(cfg, deps):
+    table_rng(cfg, "funds")
+    carry = array("d")
+    write_table(cfg, "funds", funds_header,
+                chunked(generate_funds(*asset_subclass_bounds(deps["asset"])["funds"], carry)))
+    return carry
+
+def run_cash(cfg, deps):
+    table_rng(cfg, "cash")
+    write_table(cfg, "cash", cash_header,
+                chunked(generate_cash(*asset_subclass_bounds(deps["asset"])["cash"], unit_values(cfg, deps, "cash"))))
+
+def run_bonds1(cfg, deps):
+    table_rng(cfg, "bonds1")
+    write_table(cfg, "bonds1", bonds1_header,
+                chunked(generate_bonds1(*asset_subclass_bounds(deps["asset"])["bonds"], unit_values(cfg, deps, "bonds"))))
+
+def run_bonds2(cfg, deps):
+    table_rng(cfg, "bonds2")
+    start, end = asset_subclass_bounds(deps["asset"])["bonds"]
+    rates, maturities = array("d"), array("i")
+    write_table(cfg, "bonds2", bonds2_header, chunked(generate_bonds2(end - start, rates, maturities)))
+    return {"interestrate": rates, "maturity": maturities}
+
+def run_commodity(cfg, deps):
+    table_rng(cfg, "commodity")
+    types = array("b")
+    write_table(cfg, "commodity", commodity_header,
+              chunked(generate_commodities(*asset_subclass_bounds(deps["asset"])["commodity"], types,
+                                           unit_values(cfg, deps, "commodity"))))
+    return types
+
+def run_stocks(cfg, deps):
+    table_rng(cfg, "stocks")
+    names = array("b")
+    write_table(cfg, "stocks", stocks_header,
+                chunked(generate_stocks(*asset_subclass_bounds(deps["asset"])["stocks"], names, {},
+                                        unit_values(cfg, deps, "stocks"))))
+    return names
+
+def assemble_rebalancing(blocks, pieces):
+    """Portfolio index of every rebalancing transaction, in id order, from (transaction numbers, portfolios) pieces."""
+    rebalancing_portfolios = np.zeros(int(blocks["count"].sum()), dtype=np.int32)
+    before = np.cumsum(blocks["count"]) - blocks["count"]  # rebalancing ids in the blocks before
+    for tnum, port_idx in pieces:
+        b, offset, _ = transaction_kinds(blocks, tnum)
+        rebalancing_portfolios[before[b] + offset - blocks["count"][b]] = port_idx
+    return rebalancing_portfolios
+
+def run_transaction(cfg, deps):
+    rng = table_rng(cfg, "transaction")
+    n_per_type = cfg["n_per_type"]
+    num_portfolios = len(deps["portfolio"])
+    num_assets = len(deps["asset"]["portfolio"])
+    base, length = transaction_window(cfg)
+    if cfg["engine"] == "numpy":
+        pieces = []
+        blocks = transaction_blocks(cfg)
+        chunks = generate_transactions_numpy(blocks, num_portfolios, num_assets, pieces, rng, base, (0, length),
+                                             date_range(cfg), topup_portfolio=cfg["topup_portfolio"])
+        rows = write_table(cfg, "transaction", trans_header, chunks)
+        rebalancing_portfolios = assemble_rebalancing(blocks, pieces)
+    else:
+        rebalancing_portfolios = np.zeros(n_per_type, dtype=np.int32)
+        months = [(m.year, m.month) for m in date_range(cfg).tolist()]
+        chunks = chunked(generate_transactions(n_per_type, num_portfolios, num_assets, rebalancing_portfolios,
+                                               (int(base.astype(np.int64)), length), months, cfg["topup_portfolio"]))
+        rows = write_table(cfg, "transaction", trans_header, chunks)
+    return {"rebalancing": rebalancing_portfolios, "shards": [{"file": table_filename(cfg, "transaction"), "rows": rows}]}
+
+def run_transaction_shard(cfg, deps, shard):
+    plan = transaction_plan(cfg, len(deps["portfolio"]))[shard]
+    months = date_range(cfg)
+    # as for PERFORMANCE, a month shard's stream is keyed by its month
+    rng = table_rng(cfg, "transaction", month_stream(months[shard]) if cfg["partition_by"] == "month" else shard)
+    pieces = []
+    ranges = {}
+    name = os.path.join("transaction", plan["name"])
+    rows = write_table(cfg, name, trans_header, generate_transactions_numpy(
+        transaction_blocks(cfg), len(deps["portfolio"]), len(deps["asset"]["portfolio"]), pieces, rng,
+        plan["base"], plan["window"], months, plan["tnums"], plan["portfolios"], ranges, cfg["topup_portfolio"]))
+    entry = shard_entry(cfg, table_filename(cfg, name), rows, ranges)
+    entry["rebalancing"] = pieces
+    return entry
+
+def run_transaction_join(cfg, deps):
+    shards = [deps[name] for name in sorted(deps)]
+    pieces = [piece for entry in shards for piece in entry.pop("rebalancing")]
+    return {"rebalancing": assemble_rebalancing(transaction_blocks(cfg), pieces), "shards": shards}
+
+def run_markettransaction(cfg, deps):
+    """The companyid of every market transaction, in id order."""
+    table_rng(cfg, "markettransaction")
+    companies = array("b")
+    write_table(cfg, "markettransaction", mt_header,
+                chunked(generate_market_transactions(transaction_blocks(cfg), companies)))
+    return companies
+
+def run_rebalancingtransaction(cfg, deps):
+    table_rng(cfg, "rebalancingtransaction")
+    write_table(cfg, "rebalancingtransaction", rt_header, chunked(generate_rebalancing_transactions(
+        transaction_blocks(cfg), deps["transaction"]["rebalancing"], deps["portfolio"])))
+
+def run_withdrawalortopuptransaction(cfg, deps):
+    table_rng(cfg, "withdrawalortopuptransaction")
+    write_table(cfg, "withdrawalortopuptransaction", wot_header,
+                chunked(generate_withdrawal_topups(transaction_blocks(cfg))))
+
+def run_posttradecompany(cfg, deps):
+    table_rng(cfg, "posttradecompany")
+    write_table(cfg, "posttradecompany", posttrade_header, chunked(generate_posttrade_companies()))
+
+def run_repair_portfolio(cfg, deps):
+    # "\n" line ends, as repaired_portfolio.csv had when pandas wrote it
+    write_table(cfg, "repaired_portfolio", repaired_port_header,
+                chunked(generate_repaired_portfolios(deps["portfolio"], deps["performance"]["latest"])), "\n")
+    print(f"Created '{table_filename(cfg, 'repaired_portfolio')}' with updated annualisedreturn.")
+
+def run_repair_riskassessment(cfg, deps):
+    # "\n" line ends, as pandas wrote the repaired tables
+    write_rows(cfg, "repaired_riskassessment_combined", repaired_ra_header,
+               generate_repaired_risk_assessments(deps["riskassessment"], deps["investor"]), "\n")
+    print(f"Created '{table_filename(cfg, 'repaired_riskassessment_combined')}' with the investor columns joined on.")
+
+def run_repair_transaction(cfg, deps):
+    table_rng(cfg, "repair_transaction")
+    write_table(cfg, "repaired_markettransaction", mt_header, chunked(generate_repaired_market_transactions(
+        transaction_blocks(cfg), deps["markettransaction"])), "\n")
+    print(f"Created '{table_filename(cfg, 'repaired_markettransaction')}' from the non withdrawal/top-up transactions.")
+
+def run_split_performance(cfg, deps):
+    split_performance_csv(cfg, deps["performance"]["tables"])
+    print("Split the performance table into performance1, performance2, and performance3.")
+
+# name: (dependencies, task)
+TABLES = {
+    "investor": ([], run_investor),
+    "riskassessment": (["investor"], run_riskassessment),
+    "financialgoal": (["investor"], run_financialgoal),
+    "portfolio": (["financialgoal"], run_portfolio),
+    "performance": (["portfolio"], run_performance),
+    "asset": (["portfolio"], run_asset),
+    "funds": (["asset"], run_funds),
+    "cash": (["asset"], run_cash),
+    "bonds1": (["asset"], run_bonds1),
+    "bonds2": (["asset"], run_bonds2),
+    "commodity": (["asset"], run_commodity),
+    "stocks": (["asset"], run_stocks),
+    "transaction": (["portfolio", "asset"], run_transaction),
+    "markettransaction": ([], run_markettransaction),
+    "rebalancingtransaction": (["transaction", "portfolio"], run_rebalancingtransaction),
+    "withdrawalortopuptransaction": ([], run_withdrawalortopuptransaction),
+    "posttradecompany": ([], run_posttradecompany),
+    "repair_portfolio": (["portfolio", "performance"], run_repair_portfolio),
+    "split_performance": (["performance"], run_split_performance),
+    # last, so that with the python engine the draws of the tables above stay the original script's
+    "repair_riskassessment": (["investor", "riskassessment"], run_repair_riskassessment),
+    "repair_transaction": (["markettransaction"], run_repair_transaction),
+}
+
+VALUED_PERFORMANCE_DEPS = ["portfolio", "asset", "funds", "bonds2", "commodity", "stocks", "prices"]
+UNIT_TABLES = ("cash", "bonds1", "commodity", "stocks")  # their unit columns follow the portfolios when valued
+
+def build_tasks(cfg):
+    """
+    TABLES without the tasks the profile skips, with PERFORMANCE and TRANSACTION
+    expanded into one task per shard plus a join task under the table's own name
+    when --partition-by is set.
+    """
+    tables = {name: table for name, table in TABLES.items() if name not in cfg["skip"]}
+    if cfg["performance"] == "valued":
+        # PERFORMANCE is valued from the asset tables' holdings and the shared prices, so it moves after them
+        _, performance = tables.pop("performance")
+        reordered = {}
+        for name, (deps, task) in tables.items():
+            reordered[name] = (deps + ["portfolio"] if name in UNIT_TABLES else deps, task)
+            if name == "stocks":
+                reordered["prices"] = ([], run_prices)
+                reordered["performance"] = (VALUED_PERFORMANCE_DEPS, performance)
+        tables = reordered
+    if cfg["partition_by"] == "none":
+        return tables
+    if cfg["partition_by"] == "hash":
+        num_performance = num_transaction = cfg["shards"]
+    else:
+        num_performance = num_transaction = len(date_range(cfg))
+    tasks = {}
+    for name, (deps, task) in tables.items():
+        if name == "performance":
+            shard_task, join_task, num_shards = run_performance_shard, run_performance_join, num_performance
+        elif name == "transaction":
+            shard_task, join_task, num_shards = run_transaction_shard, run_transaction_join, num_transaction
+        else:
+            tasks[name] = (deps, task)
+            continue
+        shard_names = [f"{name}/{k:03d}" for k in range(num_shards)]
+        for k, shard_name in enumerate(shard_names):
+            tasks[shard_name] = (deps, partial(shard_task, shard=k))
+        # the PERFORMANCE join sizes the latest records by the portfolios
+        tasks[name] = (shard_names + (["portfolio"] if name == "performance" else []), join_task)
+    return tasks
+
+def select_tasks(tasks, names):
+    """
+    The tasks named (a partitioned table's name takes in its shards) and all the
+    tasks they depend on, in task order; returns them and the set of named ones.
+    """
+    named = set(names)
+    for name in names:
+        named.update(d for d in tasks[name][0] if d.startswith(name + "/"))
+    needed = set()
+    stack = list(named)
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(tasks[name][0])
+    return {name: task for name, task in tasks.items() if name in needed}, named
+
+def run_tables(cfg, workers, only=None):
+    """
+    Run every task once its dependencies are done and return their results.
+    Independent tasks run in a process pool; the python engine always runs serially
+    in TABLES order because all of its tables share one random stream, and so does
+    a SQLite load, which has a single writer anyway. Except for SQLite loads, every
+    task is checkpointed (see CHECKPOINTS). With `only`, just those tasks are run,
+    on the checkpointed results of their dependencies.
+    """
+    tasks = build_tasks(cfg)
+    keys = task_keys(cfg, tasks)
+    named = set(tasks)
+    if only:
+        tasks, named = select_tasks(tasks, only)
+    checkpoints = {}
+    if cfg["format"] != "sqlite":
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        checkpoints = {name: TaskCheckpoint(name, keys[name], cfg["resume"] or name not in named) for name in tasks}
+    results = {}
+    if workers <= 1 or cfg["engine"] == "python" or cfg["format"] == "sqlite":
+        for name, (deps, task) in tasks.items():
+            results[name] = run_task(name, task, cfg, {d: results[d] for d in deps}, checkpoints.get(name))
+        return results
+
+    remaining = dict(tasks)
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while remaining or pending:
+            for name, (deps, task) in list(remaining.items()):
+                if all(d in results for d in deps):
+                    pending[pool.submit(run_task, name, task, cfg, {d: results[d] for d in deps},
+                                        checkpoints.get(name))] = name
+                    del remaining[name]
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+    return results
+
+def write_manifest(cfg, results):
+    """Write manifest.json describing the shards of the partitioned tables."""
+    manifest = {
+        "partition_by": cfg["partition_by"],
+        "hash": "murmur3 fmix32(portfolio number) mod shards" if cfg["partition_by"] == "hash" else None,
+        "tables": {name: results[name]["shards"] for name in ("performance", "transaction")},
+    }
+    with open("manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def checkpointed_results(cfg, names):
+    """
+    The results of the tasks `names` from the checkpoints of a completed run with
+    the options of cfg, without running or writing anything. Raises ValueError if
+    a task has no such checkpoint: never run, run with other options, or its files
+    changed since.
+    """
+    tasks = build_tasks(cfg)
+    keys = task_keys(cfg, tasks)
+    checkpoints = {name: TaskCheckpoint(name, keys[name], resume=True) for name in names}
+    missing = [name for name, checkpoint in checkpoints.items() if not checkpoint.is_complete()]
+    if missing:
+        raise ValueError(f"no completed checkpoint of {', '.join(missing)} for these options")
+    return {name: checkpoint.load_result() for name, checkpoint in checkpoints.items()}
+
+def run_task(name, task, cfg, deps, checkpoint=None):
+    """Run one task as a stage, or reuse its result if it already completed with the same inputs."""
+    if checkpoint is None:
+        with stage(name, cfg):
+            return task(cfg, deps)
+    if checkpoint.is_complete():
+        print(f"Reusing {checkpoint.name} from its checkpoint.")
+        return checkpoint.load_result()
+    with stage(name, cfg, checkpoint):
+        result = task(dict(cfg, checkpoint=checkpoint), deps)
+    checkpoint.complete(result)
+    return result
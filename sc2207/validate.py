@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import sys
+import time
+from operator import itemgetter
+
+import numpy as np
+
+from .profiles import PROFILES
+from .formats import FORMAT_EXTENSIONS, KEY_PREFIXES, OUTPUT_FORMATS, read_chunks, sqlite_connection, table_filename
+from .schema import answer_columns, table_schemas
+from .generatecsv import make_config
+
+# ----------------------------
+# REFERENTIAL INTEGRITY CHECK
+# python -m sc2207.validate streams every table generated in the current directory
+# once, in TABLE_SCHEMAS order (parents before children), and checks the primary
+# key of each, every foreign key, the functional dependencies the performance1/2/3
+# decomposition rests on and that the transaction subtypes are disjoint. Key
+# values are packed into non-negative int64 codes (ids without their prefix,
+# timestamps as seconds); a single-column key is kept in a bitset, one bit per id,
+# and a composite one as an int array sorted once its table has been read.
+# ----------------------------
+EPOCH = np.datetime64("1970-01-01T00:00:00", "s")
+
+# Bits of the code of each key column; a composite key packs its columns' codes side by side,
+# so it is exact while every key has at most 63 bits and its values fit their columns' bits;
+# a value that does not is reported, and cut to its bits so it cannot corrupt its neighbours
+KEY_BITS = {
+    **{column: 32 for column in KEY_PREFIXES}, "portfolioid": 30,
+    "phonenumber": 27, "bondname": 32, "datetime": 33, "gainloss": 32, "investedvalue": 31,
+    **{column: 3 for column in answer_columns},
+}
+BITSET_BITS = 32  # keys up to this wide go in a bitset
+
+# lhs -> rhs per table. performance1 is the projection on portfolioid -> investedvalue and
+# performance3 on gainloss, investedvalue -> marketvalue; in performance3 itself that
+# dependency is its primary key.
+DEPENDENCIES = {
+    "performance": [(("portfolioid",), "investedvalue"), (("gainloss", "investedvalue"), "marketvalue")],
+}
+SUBTYPES = ("markettransaction", "rebalancingtransaction", "withdrawalortopuptransaction")
+
+def parse_ints(values, skip=0):
+    """Ints of a column read back as strings (less `skip` leading characters) or as ints."""
+    if not isinstance(values[0], str):
+        return np.asarray(values, dtype=np.int64)
+    widths = set(map(len, values))
+    width = widths.pop()
+    if not widths and width - skip < 19:
+        # fixed-width digits, as the ids and phone numbers are: parse them as one byte matrix
+        text = "".join(values).encode()
+        digits = np.frombuffer(text, dtype=np.uint8).reshape(-1, width)[:, skip:] - ord("0")
+        if (digits <= 9).all():
+            return digits.astype(np.int64) @ 10 ** np.arange(width - skip - 1, -1, -1, dtype=np.int64)
+    if skip:
+        values = [v[skip:] for v in values]
+    return np.fromiter(map(int, values), dtype=np.int64, count=len(values))
+
+def encode(column, values):
+    """The int64 codes of one column of a chunk."""
+    if column in KEY_PREFIXES:
+        return parse_ints(values, len(KEY_PREFIXES[column]))
+    if column == "bondname":
+        return parse_ints(values, len("bond"))
+    if column == "datetime":
+        return (np.array(values, dtype="datetime64[s]") - EPOCH).astype(np.int64)
+    if column in answer_columns:
+        return np.frombuffer("".join(values).encode(), dtype=np.uint8) - np.int64(ord("a"))
+    if column == "gainloss":
+        return parse_ints(values) + 2**31
+    return parse_ints(values)
+
+class Bitset:
+    """Set of non-negative int keys, one bit each, grown as larger keys arrive."""
+
+    def __init__(self):
+        self.bits = np.zeros(1 << 10, dtype=np.uint8)
+
+    def add(self, keys):
+        """Add an array of keys; returns how many were in the set already or repeated in `keys`."""
+        if not len(keys):
+            return 0
+        keys, counts = np.unique(keys, return_counts=True)
+        if keys[-1] >> 3 >= len(self.bits):
+            size = len(self.bits)
+            while keys[-1] >> 3 >= size:
+                size *= 2
+            self.bits = np.concatenate([self.bits, np.zeros(size - len(self.bits), dtype=np.uint8)])
+        repeated = int(counts.sum()) - len(keys) + int(self.contains(keys).sum())
+        # keys are sorted, so the bits of one byte are adjacent
+        byte, first = np.unique(keys >> 3, return_index=True)
+        self.bits[byte] |= np.bitwise_or.reduceat((1 << (keys & 7)).astype(np.uint8), first)
+        return repeated
+
+    def finish(self):
+        return 0
+
+    def contains(self, keys):
+        found = np.zeros(len(keys), dtype=bool)
+        inside = np.flatnonzero(keys >> 3 < len(self.bits))
+        found[inside] = ((self.bits[keys[inside] >> 3] >> (keys[inside] & 7).astype(np.uint8)) & 1).astype(bool)
+        return found
+
+    def common(self, other):
+        """How many keys both sets hold."""
+        n = min(len(self.bits), len(other.bits))
+        return int(np.unpackbits(self.bits[:n] & other.bits[:n]).sum())
+
+class SortedKeys:
+    """Set of composite key codes: collected chunk by chunk, sorted once the table has been read."""
+
+    def __init__(self):
+        self.chunks = []
+        self.keys = None
+
+    def add(self, keys):
+        self.chunks.append(keys)
+        return 0
+
+    def finish(self):
+        """Sort the keys; returns how many repeat an earlier one."""
+        self.keys = np.sort(np.concatenate(self.chunks)) if self.chunks else np.zeros(0, dtype=np.int64)
+        self.chunks = []
+        return int((self.keys[1:] == self.keys[:-1]).sum())
+
+    def contains(self, keys):
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return self.keys[pos] == keys
+
+def key_set(key):
+    return Bitset() if sum(KEY_BITS[column] for column in key) <= BITSET_BITS else SortedKeys()
+
+def distinct_pairs(lhs, rhs):
+    order = np.lexsort((rhs, lhs))
+    lhs, rhs = lhs[order], rhs[order]
+    keep = np.ones(len(lhs), dtype=bool)
+    keep[1:] = (lhs[1:] != lhs[:-1]) | (rhs[1:] != rhs[:-1])
+    return lhs[keep], rhs[keep]
+
+class Dependency:
+    """Check of lhs -> rhs over the distinct (lhs, rhs) pairs of each chunk, merged at the end."""
+
+    def __init__(self):
+        self.pairs = []
+
+    def add(self, lhs, rhs):
+        self.pairs.append(distinct_pairs(lhs, rhs))
+
+    def finish(self):
+        """Returns how many lhs values have more than one rhs."""
+        if not self.pairs:
+            return 0
+        lhs, _ = distinct_pairs(*(np.concatenate(part) for part in zip(*self.pairs)))
+        self.pairs = []
+        return int(np.count_nonzero(lhs[1:] == lhs[:-1]))
+
+class Chunk:
+    """The columns of one chunk of rows, each encoded the first time a key asks for it."""
+
+    def __init__(self, columns, rows):
+        self.index = {column: i for i, column in enumerate(columns)}
+        self.rows = rows
+        self.codes = {}
+        self.overflows = {}  # column -> (codes outside its KEY_BITS, the first such value)
+
+    def code(self, column):
+        if column not in self.codes:
+            codes = encode(column, list(map(itemgetter(self.index[column]), self.rows)))
+            if column in KEY_BITS:
+                outside = np.flatnonzero((codes < 0) | (codes >> KEY_BITS[column] != 0))
+                if len(outside):
+                    # packed as they are, they would spill into the neighbouring columns' bits
+                    self.overflows[column] = (len(outside), self.rows[outside[0]][self.index[column]])
+                    codes = codes & ((1 << KEY_BITS[column]) - 1)
+            self.codes[column] = codes
+        return self.codes[column]
+
+    def key(self, columns):
+        key = np.zeros(len(self.rows), dtype=np.int64)
+        for column in columns:
+            key = (key << KEY_BITS[column]) | self.code(column)
+        return key
+
+    def values(self, columns, i):
+        return tuple(self.rows[i][self.index[column]] for column in columns)
+
+def table_names(cfg, table, shards):
+    """The outputs holding `table`: its shards as listed in manifest.json, or the table itself."""
+    if cfg["format"] != "sqlite" and table in shards:
+        extension = FORMAT_EXTENSIONS[cfg["format"]]
+        return [entry["file"][:-len(extension)] for entry in shards[table]]
+    return [table]
+
+def present(cfg, name):
+    if cfg["format"] == "sqlite":
+        return sqlite_connection(cfg["database"]).execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+    return os.path.exists(table_filename(cfg, name))
+
+def validate(cfg):
+    """Check every table of the profile of cfg in the current directory; returns the problems found."""
+    shards = {}
+    if os.path.exists("manifest.json"):
+        with open("manifest.json") as f:
+            shards = json.load(f)["tables"]
+    if cfg["format"] == "sqlite" and not os.path.exists(cfg["database"]):
+        return [f"no database {cfg['database']}"]
+    problems = []
+    keys = {}
+    for table, (columns, primary_key, references) in table_schemas(cfg).items():
+        names = table_names(cfg, table, shards)
+        missing = [name for name in names if not present(cfg, name)]
+        if missing:
+            problems.append(f"{table}: missing {', '.join(missing)}")
+            continue
+        start = time.perf_counter()
+        primary = key_set(primary_key)
+        references = {fk: parent for fk, parent in references.items() if parent in keys}
+        orphans = dict.fromkeys(references, 0)
+        examples = {}
+        dependencies = {dependency: Dependency() for dependency in DEPENDENCIES.get(table, ())}
+        overflows = {}
+        rows = duplicates = 0
+        for name in names:
+            for rows_ in read_chunks(cfg, name):
+                rows += len(rows_)
+                chunk = Chunk(columns, rows_)
+                duplicates += primary.add(chunk.key(primary_key))
+                for fk, parent in references.items():
+                    lost = np.flatnonzero(~keys[parent].contains(chunk.key(fk)))
+                    if len(lost):
+                        orphans[fk] += len(lost)
+                        examples.setdefault(fk, chunk.values(fk, lost[0]))
+                for (lhs, rhs), dependency in dependencies.items():
+                    dependency.add(chunk.key(lhs), chunk.code(rhs))
+                for column, (count, example) in chunk.overflows.items():
+                    total, first = overflows.get(column, (0, example))
+                    overflows[column] = (total + count, first)
+        duplicates += primary.finish()
+        keys[table] = primary
+        print(f"{table:<30} {rows:>12,} rows {time.perf_counter() - start:>8.2f}s")
+
+        for column, (count, example) in overflows.items():
+            problems.append(f"{table}: {count:,} values of {column} do not fit its {KEY_BITS[column]}-bit key code, "
+                            f"e.g. {example}; the key checks of {table} are unreliable")
+        if duplicates:
+            problems.append(f"{table}: {duplicates:,} rows repeat a primary key ({', '.join(primary_key)})")
+        for fk, parent in references.items():
+            if orphans[fk]:
+                problems.append(f"{table}: {orphans[fk]:,} rows reference no {parent} "
+                                f"({', '.join(fk)}), e.g. {examples[fk]}")
+        for (lhs, rhs), dependency in dependencies.items():
+            violations = dependency.finish()
+            if violations:
+                problems.append(f"{table}: {violations:,} values of ({', '.join(lhs)}) have more than one {rhs}")
+
+    subtypes = [table for table in SUBTYPES if table in keys]
+    for i, a in enumerate(subtypes):
+        for b in subtypes[i + 1:]:
+            shared = keys[a].common(keys[b])
+            if shared:
+                problems.append(f"{a} and {b} share {shared:,} transactionids")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the primary keys, foreign keys and dependencies of the generated tables.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="denzel",
+                        help="profile the tables were generated with (default denzel)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="output format (default csv)")
+    parser.add_argument("--database", default="sc2207.db", help="SQLite database for --format sqlite")
+    args = parser.parse_args()
+
+    cfg = make_config(1, fmt=args.format, database=args.database, profile=args.profile)
+    start = time.perf_counter()
+    problems = validate(cfg)
+    for problem in problems:
+        print("PROBLEM " + problem)
+    print(f"{len(problems)} problem(s) in {time.perf_counter() - start:.2f}s.")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
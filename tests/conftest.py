@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+from sc2207.checkpoints import CHECKPOINT_DIR
+from sc2207.generatecsv import main
+
+
+@pytest.fixture
+def generate(monkeypatch):
+    """Run python -m sc2207 (or the main() of a profile's wrapper) with `options` in `directory`."""
+    def run(directory, *options, profile="denzel"):
+        directory.mkdir(parents=True, exist_ok=True)
+        monkeypatch.chdir(directory)
+        monkeypatch.setattr(sys, "argv", ["sc2207", *options])
+        main(profile)
+        return directory
+    return run
+
+
+def read_tree(directory):
+    """Every output file under `directory` as {relative path: bytes}, without the checkpoints."""
+    files = {}
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = [d for d in dirs if d != CHECKPOINT_DIR]
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, directory)] = f.read()
+    return files
+
+
+@pytest.fixture
+def tree():
+    return read_tree
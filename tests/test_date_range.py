@@ -0,0 +1,20 @@
+import csv
+
+
+def test_appending_months_equals_a_fresh_run(generate, tree, tmp_path):
+    options = ("--partition-by", "month", "--workers", "2")
+    generate(tmp_path / "appended", *options, "--end", "2024-06")
+    appended = tree(generate(tmp_path / "appended", *options, "--end", "2024-12", "--resume"))
+    fresh = tree(generate(tmp_path / "fresh", *options, "--end", "2024-12"))
+    assert sorted(appended) == sorted(fresh)
+    for name, data in fresh.items():
+        assert appended[name] == data, name
+
+
+def test_walk_follows_the_range(generate, tmp_path):
+    generate(tmp_path, "--performance", "walk", "--start", "2025-03", "--end", "2025-05", "--steps-per-day", "2")
+    with open(tmp_path / "performance.csv", newline="") as f:
+        dates = sorted({row["datetime"] for row in csv.DictReader(f)})
+    assert dates[0] == "2025-03-01 12:00:00"
+    assert dates[-1] == "2025-06-01 00:00:00"
+    assert len(dates) == 92 * 2  # March to May, two points a day
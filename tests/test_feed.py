@@ -0,0 +1,47 @@
+import glob
+import sys
+import time
+
+import pandas as pd
+import pytest
+
+from sc2207 import feed
+
+
+def run_feed(monkeypatch, *options):
+    monkeypatch.setattr(sys, "argv", ["sc2207.feed", *options])
+    feed.main()
+
+
+def read_feed(directory, table):
+    files = sorted(glob.glob(str(directory / "feed" / table / "*.csv")))
+    return pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+
+
+def test_feed_continues_the_dataset(generate, tmp_path, monkeypatch):
+    generate(tmp_path, "--transaction-digits", "7", "--workers", "1")
+    for _ in range(2):  # the second session continues the first
+        run_feed(monkeypatch, "--transaction-digits", "7", "--duration", "1",
+                 "--transaction-rate", "200", "--performance-rate", "400")
+    now = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+
+    transactions = read_feed(tmp_path, "transaction")
+    assert transactions["transactionid"].tolist() == [f"t{n:07d}" for n in range(901, 901 + len(transactions))]
+    subtypes = pd.concat([read_feed(tmp_path, table)["transactionid"] for table in
+                          ("markettransaction", "rebalancingtransaction", "withdrawalortopuptransaction")])
+    assert sorted(subtypes) == transactions["transactionid"].tolist()
+    assert (transactions["transactiondate"] <= now).all()
+
+    performance = read_feed(tmp_path, "performance")
+    batch_last = pd.read_csv(tmp_path / "performance.csv")["datetime"].max()
+    assert ((performance["datetime"] > batch_last) & (performance["datetime"] <= now)).all()
+    assert not performance.duplicated(["portfolioid", "datetime"]).any()
+
+
+def test_feed_without_room_for_its_ids_fails_before_writing(generate, tmp_path, monkeypatch, capsys):
+    generate(tmp_path, "--workers", "1")  # 3-digit transactionids: 99 left after t900
+    with pytest.raises(SystemExit) as exit:
+        run_feed(monkeypatch, "--duration", "1", "--transaction-rate", "1000")
+    assert exit.value.code == 2
+    assert "--transaction-digits 4" in capsys.readouterr().err
+    assert not (tmp_path / "feed").exists()
@@ -0,0 +1,29 @@
+import numpy as np
+
+from sc2207.generators import KeySet
+
+
+def test_keyset_matches_python_set():
+    rng = np.random.default_rng(0)
+    keys = KeySet(capacity=8)  # tiny, so the table regrows many times
+    expected = set()
+    for _ in range(200):
+        # a narrow key range repeats keys within and across chunks and crowds the probes
+        chunk = rng.integers(-5000, 5000, size=rng.integers(0, 300))
+        new = keys.add(chunk)
+        first_seen = [key not in expected and key not in chunk[:i].tolist() for i, key in enumerate(chunk.tolist())]
+        assert new.tolist() == first_seen
+        expected.update(chunk.tolist())
+        assert keys.size == len(expected)
+    stored = keys.slots[keys.slots != keys.EMPTY]
+    assert sorted(stored.tolist()) == sorted(expected)
+
+
+def test_keyset_colliding_keys():
+    keys = KeySet(capacity=16)
+    # 8 keys that all hash to the last slot, so their probes wrap around to the start
+    candidates = np.arange(10_000, dtype=np.int64)
+    chunk = candidates[keys.slot_of(candidates) == 15][:8]
+    assert keys.add(chunk).all()
+    assert not keys.add(chunk).any()
+    assert keys.size == 8
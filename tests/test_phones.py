@@ -0,0 +1,16 @@
+import numpy as np
+
+from sc2207.generators import allocate_phones, phone_keys
+
+
+def test_allocate_phones_is_a_bijection():
+    keys = phone_keys(np.random.default_rng(7))
+    n = 3_000_000
+    phones = allocate_phones(0, n, keys)
+    assert len(np.unique(phones)) == n
+    lead, rest = phones // 10**7, phones % 10**7
+    assert np.isin(lead, [8, 9]).all()
+    assert ((rest >= 10**6) & (rest < 10**7)).all()
+    # investors are allocated chunk by chunk; the chunks must give the same numbers
+    assert np.array_equal(np.concatenate([allocate_phones(0, n // 3, keys),
+                                          allocate_phones(n // 3, n, keys)]), phones)
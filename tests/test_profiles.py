@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+# The repair scripts wrote these from an earlier dataset than the one committed next to them
+STALE = {"ganqingrong": {"repaired_markettransaction.csv", "repaired_riskassessment_combined.csv"}}
+
+
+@pytest.mark.parametrize("profile", ["denzel", "ganqingrong"])
+def test_python_engine_reproduces_the_committed_files(profile, generate, tree, tmp_path):
+    generate(tmp_path, "--engine", "python", "--seed", "42", profile=profile)
+    committed = os.path.join(ROOT, profile)
+    names = sorted(name for name in os.listdir(committed)
+                   if name.endswith(".csv") and name not in STALE.get(profile, ())
+                   and os.path.exists(tmp_path / name))
+    assert len(names) >= 17
+    generated = tree(tmp_path)
+    for name in names:
+        with open(os.path.join(committed, name), "rb") as f:
+            expected = f.read()
+        actual = generated[name]
+        if b"\r\n" not in expected:  # the ganqingrong files are stored with \n line endings
+            actual = actual.replace(b"\r\n", b"\n")
+        assert actual == expected, name
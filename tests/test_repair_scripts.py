@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "ganqingrong")
+
+
+def run_script(directory, name, *options):
+    subprocess.run([sys.executable, os.path.join(SCRIPTS, name), *options], cwd=directory, check=True,
+                   capture_output=True)
+
+
+def read_text(path):
+    with open(path, newline="") as f:
+        return f.read()
+
+
+@pytest.fixture
+def dataset(generate, tmp_path):
+    return generate(tmp_path, "--scale", "2", "--workers", "1")
+
+
+def original_repair_portfolio():
+    """repairPortfolioCSV.py as it was: sort all of performance and take each portfolio's last row."""
+    performance_df = pd.read_csv("performance.csv", parse_dates=["datetime"])
+    portfolio_df = pd.read_csv("portfolio.csv")
+    latest_returns = (
+        performance_df.sort_values("datetime")
+        .groupby("portfolioid")
+        .last()
+        [["annualreturns"]]
+        .rename(columns={"annualreturns": "annualisedreturn"})
+    )
+    portfolio_df = portfolio_df.drop(columns=["annualisedreturn"]).merge(
+        latest_returns, on="portfolioid", how="left"
+    )
+    return portfolio_df.to_csv(index=False)
+
+
+@pytest.mark.parametrize("chunk_rows", ["1000000", "7"])
+def test_repair_portfolio_matches_the_original(chunk_rows, dataset):
+    expected = original_repair_portfolio()
+    run_script(dataset, "repairPortfolioCSV.py", "--chunk-rows", chunk_rows)
+    assert read_text(dataset / "repaired_portfolio.csv") == expected
+
+
+def original_repair_transactions():
+    """repairTransactionCSVs.py as it was, but for its unseeded companyids: (kept rows, all transactionids)."""
+    transaction_df = pd.read_csv("transaction.csv")
+    withdrawal_topup_df = pd.read_csv("withdrawalortopuptransaction.csv")
+    market_transaction_df = pd.read_csv("markettransaction.csv")
+    market_transaction_df = market_transaction_df[
+        ~market_transaction_df["transactionid"].isin(withdrawal_topup_df["transactionid"])
+    ]
+    to_add_ids = set(transaction_df["transactionid"]) - set(withdrawal_topup_df["transactionid"])
+    return market_transaction_df.reset_index(drop=True), set(market_transaction_df["transactionid"]) | to_add_ids
+
+
+@pytest.mark.parametrize("chunk_rows", ["1000000", "7"])
+def test_repair_transactions_matches_the_original(chunk_rows, dataset):
+    # a market transaction that is also a withdrawal/top-up, for the repair to drop
+    withdrawal = pd.read_csv(dataset / "withdrawalortopuptransaction.csv")["transactionid"].iloc[0]
+    with open(dataset / "markettransaction.csv", "a", newline="") as f:
+        f.write(f"{withdrawal},brk001\r\n")
+    kept, ids = original_repair_transactions()
+
+    run_script(dataset, "repairTransactionCSVs.py", "--chunk-rows", chunk_rows)
+    repaired = pd.read_csv(dataset / "repaired_markettransaction.csv")
+    pd.testing.assert_frame_equal(repaired.iloc[:len(kept)], kept)
+    assert withdrawal not in set(repaired["transactionid"])
+    # the original appended the kept ids a second time; the repair adds each missing id once
+    assert not repaired["transactionid"].duplicated().any()
+    assert set(repaired["transactionid"]) == ids
+    added = repaired.iloc[len(kept):]
+    added_ids = set(added["transactionid"])
+    transaction_order = pd.read_csv(dataset / "transaction.csv")["transactionid"].tolist()
+    assert added["transactionid"].tolist() == [tid for tid in transaction_order if tid in added_ids]
+    assert added["companyid"].isin(pd.read_csv(dataset / "posttradecompany.csv")["companyid"]).all()
+
+
+def test_repair_transactions_is_seeded(dataset):
+    run_script(dataset, "repairTransactionCSVs.py")
+    first = read_text(dataset / "repaired_markettransaction.csv")
+    run_script(dataset, "repairTransactionCSVs.py", "--chunk-rows", "7")
+    assert read_text(dataset / "repaired_markettransaction.csv") == first
+
+
+def test_repair_risk_assessments_matches_the_original(dataset):
+    expected = pd.read_csv("riskassessment_combined.csv").merge(
+        pd.read_csv("investor.csv"), on="phonenumber", how="left").to_csv(index=False)
+    run_script(dataset, "repairRiskAssessmentCombined.py")
+    assert read_text(dataset / "repaired_riskassessment_combined.csv") == expected
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_repairs_of_binary_tables_match_those_of_csv(fmt, generate, tmp_path):
+    pytest.importorskip("pyarrow")
+    sys.path.insert(0, SCRIPTS)
+    try:
+        import tableio
+    finally:
+        sys.path.remove(SCRIPTS)
+    scripts = ["repairPortfolioCSV.py", "repairRiskAssessmentCombined.py", "repairTransactionCSVs.py"]
+    outputs = ["repaired_portfolio", "repaired_riskassessment_combined", "repaired_markettransaction"]
+    for form in ("csv", fmt):
+        generate(tmp_path / form, "--workers", "1", "--format", form)
+        for script in scripts:
+            run_script(tmp_path / form, script, "--format", form)
+    for name in outputs:
+        from_csv = tableio.read_table(str(tmp_path / "csv" / name), "csv")
+        binary = tableio.read_table(str(tmp_path / fmt / name), fmt)
+        pd.testing.assert_frame_equal(binary.astype(str), from_csv.astype(str), obj=name)
@@ -0,0 +1,34 @@
+import pytest
+
+from sc2207.checkpoints import TaskCheckpoint
+
+# a walk with 4 points a day writes PERFORMANCE in more than one chunk
+OPTIONS = ("--performance", "walk", "--steps-per-day", "4", "--workers", "1")
+
+
+class Crash(Exception):
+    pass
+
+
+def test_resume_after_a_crash_gives_the_same_files(generate, tree, tmp_path, monkeypatch):
+    fresh = tree(generate(tmp_path / "fresh", *OPTIONS))
+
+    chunk_done = TaskCheckpoint.chunk_done
+
+    def crash_in_performance(self, filename, f, chunks, rows):
+        chunk_done(self, filename, f, chunks, rows)
+        if filename == "performance.csv":
+            f.write("p001,half a row")  # the process dies partway through the next chunk
+            f.flush()
+            raise Crash
+
+    with monkeypatch.context() as m:
+        m.setattr(TaskCheckpoint, "chunk_done", crash_in_performance)
+        with pytest.raises(Crash):
+            generate(tmp_path / "resumed", *OPTIONS)
+    assert b"half a row" in tree(tmp_path / "resumed")["performance.csv"]
+
+    resumed = tree(generate(tmp_path / "resumed", *OPTIONS, "--resume"))
+    assert sorted(resumed) == sorted(fresh)
+    for name, data in fresh.items():
+        assert resumed[name] == data, name
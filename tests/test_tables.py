@@ -0,0 +1,23 @@
+import shutil
+
+import pytest
+
+
+@pytest.mark.parametrize("partition_by, tables, files", [
+    ("none", ["performance", "stocks"], ["performance.csv", "stocks.csv"]),
+    ("hash", ["performance/003", "transaction/001"], ["performance/shard-003.csv", "transaction/shard-001.csv"]),
+])
+def test_tables_regenerates_the_same_bytes(partition_by, tables, files, generate, tree, tmp_path):
+    options = ("--partition-by", partition_by, "--workers", "2")
+    full = tree(generate(tmp_path / "full", *options))
+    shutil.copytree(tmp_path / "full", tmp_path / "some")
+    for name in files:
+        (tmp_path / "some" / name).write_text("stale")
+    some = tree(generate(tmp_path / "some", *options, "--tables", *tables))
+    assert some == full
+
+
+def test_tables_without_checkpoints_generates_the_inputs_too(generate, tree, tmp_path):
+    full = tree(generate(tmp_path / "full", "--workers", "2"))
+    some = tree(generate(tmp_path / "some", "--workers", "2", "--tables", "rebalancingtransaction"))
+    assert some["rebalancingtransaction.csv"] == full["rebalancingtransaction.csv"]
@@ -0,0 +1,50 @@
+import csv
+
+import pytest
+
+from sc2207 import validate
+from sc2207.generatecsv import make_config
+from sc2207.tasks import run_tables
+
+
+def rewrite_csv(name, change):
+    with open(f"{name}.csv", newline="") as f:
+        rows = list(csv.reader(f))
+    change(rows)
+    with open(f"{name}.csv", "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cfg = make_config(1)
+    run_tables(cfg, 1)
+    return cfg
+
+
+def test_validator_passes_generated_tables(dataset):
+    assert validate.validate(dataset) == []
+
+
+def test_validator_flags_seeded_violations(dataset):
+    rewrite_csv("portfolio", lambda rows: rows.append(rows[1]))  # primary key
+    rewrite_csv("markettransaction", lambda rows: rows[1].__setitem__(1, "brk099"))  # foreign key
+
+    def change_invested(rows):  # portfolioid -> investedvalue
+        rows[2][2] = str(int(rows[2][2]) + 1)
+    rewrite_csv("performance", change_invested)
+
+    problems = validate.validate(dataset)
+    assert len(problems) == 3
+    assert "portfolio: 1 rows repeat a primary key (portfolioid)" in problems
+    assert any(p.startswith("markettransaction: 1 rows reference no posttradecompany") for p in problems)
+    assert "performance: 1 values of (portfolioid) have more than one investedvalue" in problems
+
+
+def test_validator_flags_key_codes_that_overflow(dataset):
+    # portfolioid codes have 30 bits; this id needs 34
+    rewrite_csv("portfolio", lambda rows: rows[1].__setitem__(0, "p9999999999"))
+    problems = validate.validate(dataset)
+    assert ("portfolio: 1 values of portfolioid do not fit its 30-bit key code, e.g. p9999999999; "
+            "the key checks of portfolio are unreliable") in problems
@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.mark.parametrize("partition_by", ["none", "hash"])
+def test_output_does_not_depend_on_the_workers(partition_by, generate, tree, tmp_path):
+    options = ("--scale", "2", "--partition-by", partition_by)
+    serial = tree(generate(tmp_path / "serial", *options, "--workers", "1"))
+    parallel = tree(generate(tmp_path / "parallel", *options, "--workers", "4"))
+    assert sorted(parallel) == sorted(serial)
+    for name, data in serial.items():
+        assert parallel[name] == data, name